@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure startup time and blit throughput of the image assets"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Startups per mode")
+    parser.add_argument("--blits", type=int, default=5000, help="Blits per image")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+
+def startup():
+    """Runs in a fresh process: opens the window and loads every image."""
+    started_at = time.perf_counter()
+    import pygame
+
+    from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT, assets
+    import graphics.screens  # noqa: F401
+
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    imported_at = time.perf_counter()
+    assets.load_all()
+    loaded_at = time.perf_counter()
+    print(
+        json.dumps(
+            {
+                "import": imported_at - started_at,
+                "load": loaded_at - imported_at,
+                "load_times": assets.load_times,
+            }
+        )
+    )
+
+
+def run_startups(cache_dir, runs, fresh):
+    results = []
+    for _ in range(runs):
+        if fresh:
+            cache_dir = tempfile.mkdtemp(prefix="asset_cache_")
+        output = subprocess.run(
+            [sys.executable, __file__, "--child"],
+            env={**os.environ, "ASSET_CACHE_DIR": cache_dir},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return results
+
+
+def print_startups(name, results):
+    imports = sorted(result["import"] for result in results)
+    loads = sorted(result["load"] for result in results)
+    print(
+        f"{name:<10} import+window {imports[len(imports) // 2] * 1000:>7.1f} ms, "
+        f"all images {loads[len(loads) // 2] * 1000:>7.1f} ms"
+    )
+
+
+def measure_blits():
+    import pygame
+
+    from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT, assets
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    print(f"{'image':<14} {'size':>9} {'unconverted':>14} {'converted':>14}")
+    for name in ("blob_white", "happy_face", "dance_button", "logo"):
+        converted = assets.get(name)
+        unconverted = pygame.transform.scale(
+            pygame.image.load(assets.sources[name][0]), converted.get_size()
+        )
+        rates = []
+        for image in (unconverted, converted):
+            started_at = time.perf_counter()
+            for i in range(args.blits):
+                screen.blit(image, (i % 500, i % 300))
+            rates.append(args.blits / (time.perf_counter() - started_at))
+        width, height = converted.get_size()
+        print(
+            f"{name:<14} {f'{width}x{height}':>9} "
+            f"{rates[0]:>10.0f} /s {rates[1]:>10.0f} /s"
+        )
+    pygame.quit()
+
+
+def main():
+    warm_cache_dir = tempfile.mkdtemp(prefix="asset_cache_")
+    run_startups(warm_cache_dir, 1, fresh=False)
+
+    print(f"median of {args.runs} startups")
+    print_startups("no cache", run_startups("", args.runs, fresh=False))
+    cold = run_startups("", args.runs, fresh=True)
+    print_startups("cold", cold)
+    warm = run_startups(warm_cache_dir, args.runs, fresh=False)
+    print_startups("warm", warm)
+
+    print(f"{'image':<22} {'cold':>9} {'warm':>9}")
+    for name in cold[0]["load_times"]:
+        cold_time = sorted(result["load_times"][name] for result in cold)
+        warm_time = sorted(result["load_times"][name] for result in warm)
+        print(
+            f"{name:<22} {cold_time[len(cold) // 2] * 1000:>6.2f} ms "
+            f"{warm_time[len(warm) // 2] * 1000:>6.2f} ms"
+        )
+    print()
+    measure_blits()
+
+
+if __name__ == "__main__":
+    if args.child:
+        startup()
+    else:
+        main()
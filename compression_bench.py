@@ -0,0 +1,162 @@
+import argparse
+import time
+import zlib
+
+from network import compression, fragments
+from network.capture import read_capture
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare per-datagram compression of game states"
+    )
+    parser.add_argument(
+        "capture", type=str, nargs="?", help="Capture file (NET_CAPTURE_FILE)"
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        default=100,
+        help="Simulated players, when no capture is given",
+    )
+    parser.add_argument("--states", type=int, default=200, help="Simulated states")
+    parser.add_argument("--mtu", type=int, default=1500)
+    parser.add_argument("--dictionary", type=str, help="Dictionary file to compare")
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Write a dictionary trained on the first half of the payloads here",
+    )
+    return parser.parse_args()
+
+
+def captured_payloads(path, compressor):
+    reassembler = fragments.Reassembler()
+    for timestamp, data in read_capture(path):
+        if fragments.is_fragment(data):
+            data = reassembler.add(data, timestamp)
+            if data is None:
+                continue
+        if compression.is_compressed(data):
+            data, _ = compressor.decompress(data)
+        yield bytes(data)
+
+
+def simulated_payloads(players, states):
+    # Imported here so benchmarking a capture does not need the simulation.
+    from local_server import Simulation
+
+    simulation = Simulation(players, 120)
+    simulated = list(simulation.players)
+    for sequence in range(states):
+        simulation.step(simulated)
+        game_state = simulation.game_state(simulated[0])
+        game_state.sequence = sequence
+        game_state.server_time = int(time.time() * 1000)
+        yield game_state.model_dump_json(by_alias=True).encode()
+
+
+def datagram_count(size, datagram_size):
+    if size <= datagram_size:
+        return 1
+    return -(-size // (datagram_size - fragments.HEADER.size))
+
+
+def measure(name, payloads, compress, decompress, datagram_size):
+    raw_size = compressed_size = datagrams = 0
+    compress_time = decompress_time = 0.0
+    for payload in payloads:
+        started_at = time.perf_counter()
+        packed = compress(payload)
+        compress_time += time.perf_counter() - started_at
+        started_at = time.perf_counter()
+        decompress(packed)
+        decompress_time += time.perf_counter() - started_at
+        raw_size += len(payload)
+        compressed_size += len(packed)
+        datagrams += datagram_count(len(packed), datagram_size)
+
+    count = len(payloads)
+    print(
+        f"{name:<12} {compressed_size / count:>9.0f} B "
+        f"{raw_size / compressed_size:>6.2f}x "
+        f"{datagrams / count:>9.2f} "
+        f"{compress_time / count * 1e6:>9.1f} µs "
+        f"{decompress_time / count * 1e6:>9.1f} µs"
+    )
+
+
+def main():
+    args = parse_args()
+    compressor = compression.Compressor()
+    if args.dictionary:
+        compressor.add_dictionary(
+            compression.CUSTOM_DICTIONARY, compression.load_dictionary(args.dictionary)
+        )
+
+    if args.capture:
+        payloads = list(captured_payloads(args.capture, compressor))
+    else:
+        payloads = list(simulated_payloads(args.players, args.states))
+    if len(payloads) < 2:
+        print("Not enough game states to compare")
+        return
+
+    # The trained dictionary is only measured on payloads it has not seen.
+    training, payloads = payloads[: len(payloads) // 2], payloads[len(payloads) // 2 :]
+    trained = compression.Compressor(
+        {compression.CUSTOM_DICTIONARY: compression.build_dictionary(training)}
+    )
+    if args.output:
+        with open(args.output, "wb") as dictionary_file:
+            dictionary_file.write(trained.dictionaries[compression.CUSTOM_DICTIONARY])
+
+    datagram_size = fragments.max_datagram_size(args.mtu)
+    raw_size = sum(len(payload) for payload in payloads) / len(payloads)
+    print(f"{len(payloads)} game states, {raw_size:.0f} B on average")
+    print(
+        f"{'':<12} {'size':>11} {'ratio':>7} {'datagrams':>9} "
+        f"{'compress':>12} {'decompress':>12}"
+    )
+    measure(
+        "none",
+        payloads,
+        lambda payload: payload,
+        lambda data: data,
+        datagram_size,
+    )
+    measure(
+        "zlib",
+        payloads,
+        lambda payload: zlib.compress(payload, compression.COMPRESSION_LEVEL),
+        zlib.decompress,
+        datagram_size,
+    )
+    measure(
+        "built-in",
+        payloads,
+        compressor.compress,
+        compressor.decompress,
+        datagram_size,
+    )
+    if args.dictionary:
+        measure(
+            "--dictionary",
+            payloads,
+            lambda payload: compressor.compress(
+                payload, compression.CUSTOM_DICTIONARY
+            ),
+            compressor.decompress,
+            datagram_size,
+        )
+    measure(
+        "trained",
+        payloads,
+        lambda payload: trained.compress(payload, compression.CUSTOM_DICTIONARY),
+        trained.decompress,
+        datagram_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from models import GameState, PlayerState, SongState
+from network import codec
+from network.offload import StateRing
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the decode cost of received game states"
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Players in every game state",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=1, help="Time spent decoding per case"
+    )
+    return parser.parse_args()
+
+
+def make_game_state(player_count):
+    random.seed(player_count)
+    return GameState(
+        players=[
+            PlayerState(
+                userId=f"bench-{i:06d}",
+                username=f"dancer{i}",
+                latitude=random.uniform(0, 600),
+                longitude=random.uniform(0, 1100),
+                isMain=i == 0,
+                status="dancing" if i % 2 else "idle",
+                lastMark=random.choice([None, "perfect", "good", "miss"]),
+                color=random.choice(["white", "green", "lavender", "maroon"]),
+            )
+            for i in range(player_count)
+        ],
+        song=SongState(
+            id="decode-bench",
+            title="Benchmark",
+            bpm=120,
+            onset=0.5,
+            startTimestamp=int(time.time() * 1000),
+        ),
+        locationTitle="Benchmark floor",
+        arrowCombination=["0", "1", "-2", "3"],
+        scores={f"dancer{i}": i for i in range(min(player_count, 5))},
+        sequence=1,
+        serverTime=int(time.time() * 1000),
+    )
+
+
+def decode_old(data):
+    """The decode path before validating from bytes: str, dict tree, model."""
+    return GameState(**json.loads(data.decode()))
+
+
+def decode_json(data):
+    return GameState.model_validate_json(data)
+
+
+def read_ring(ring):
+    """What the UI process pays per state with NET_OFFLOAD_DECODE."""
+    ring.last_read = 0
+    return ring.read_latest()
+
+
+def measure(decode, data, seconds):
+    decode(data)
+    count = 0
+    started_at = time.perf_counter()
+    deadline = started_at + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(10):
+            decode(data)
+        count += 10
+    rate = count / (time.perf_counter() - started_at)
+
+    # Peak of the memory allocated while decoding one packet, including the
+    # intermediate objects freed before it returns.
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    decode(data)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return rate, peak
+
+
+def main():
+    args = parse_args()
+    print(
+        f"{'players':>7} {'path':<8} {'size':>9} {'packets':>12} "
+        f"{'allocated':>11}"
+    )
+    ring = StateRing()
+    for player_count in args.players:
+        game_state = make_game_state(player_count)
+        json_data = game_state.model_dump_json(by_alias=True).encode()
+        binary_data = codec.encode_game_state(
+            game_state, codec.PlayerTable(), announce_all=True
+        )
+        # Once acknowledged, identities are no longer sent.
+        encoder, decoder = codec.PlayerTable(), codec.PlayerTable()
+        codec.decode_game_state(codec.encode_game_state(game_state, encoder), decoder)
+        encoder.acknowledge(game_state.sequence)
+        acked_data = codec.encode_game_state(game_state, encoder)
+        cases = (
+            ("old", decode_old, json_data),
+            ("json", decode_json, json_data),
+            (
+                "binary",
+                lambda data: codec.decode_game_state(data, codec.PlayerTable()),
+                binary_data,
+            ),
+            (
+                "acked",
+                lambda data: codec.decode_game_state(data, decoder),
+                acked_data,
+            ),
+            ("ring", read_ring, ring),
+        )
+        ring_size = ring.publish(game_state)
+        for name, decode, data in cases:
+            # Binary states carry positions as 32-bit floats.
+            assert len(decode(data).players) == player_count
+            rate, peak = measure(decode, data, args.seconds)
+            size = ring_size if data is ring else len(data)
+            print(
+                f"{player_count:>7} {name:<8} {size:>7} B "
+                f"{rate:>10,.0f}/s {peak / 1024:>7.1f} KiB"
+            )
+    ring.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import time
+
+import pygame
+
+# Scaled images are saved here, so later runs skip decoding and scaling the
+# full-size sources. An empty value disables the cache.
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", ".asset_cache")
+
+
+class AssetManager:
+    """Loads images on first use and keeps them in the display pixel format.
+
+    Images are registered with an optional target width or height (or a
+    function returning one) and are scaled keeping their aspect ratio.
+    Scaled variants are cached on disk under the hash of the source file and
+    the target size. Once a display surface exists, every image is converted
+    to its format, so blitting it does not convert pixels every frame.
+    """
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.sources = {}
+        self._images = {}
+        self._converted = set()
+
+        self.load_times = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def register(self, name, path, width=None, height=None):
+        self.sources[name] = (path, width, height)
+
+    def get(self, name):
+        image = self._images.get(name)
+        if image is None:
+            image = self._images[name] = self._load(name)
+        if name not in self._converted and pygame.display.get_surface():
+            # Images loaded before the window was opened are converted late.
+            image = self._images[name] = image.convert_alpha()
+            self._converted.add(name)
+        return image
+
+    def load_all(self):
+        for name in self.sources:
+            self.get(name)
+
+    def _load(self, name):
+        started_at = time.perf_counter()
+        path, width, height = self.sources[name]
+        width = width() if callable(width) else width
+        height = height() if callable(height) else height
+
+        cache_path = None
+        if self.cache_dir and (width or height):
+            with open(path, "rb") as source:
+                digest = hashlib.sha1(source.read()).hexdigest()[:16]
+            cache_path = os.path.join(
+                self.cache_dir, f"{digest}_{width or ''}x{height or ''}.png"
+            )
+
+        if cache_path and os.path.exists(cache_path):
+            image = pygame.image.load(cache_path)
+            self.cache_hits += 1
+        else:
+            image = _scale(pygame.image.load(path), width, height)
+            if cache_path:
+                self.cache_misses += 1
+                _save(image, cache_path)
+
+        self.load_times[name] = time.perf_counter() - started_at
+        return image
+
+    def get_stats(self):
+        return {
+            "loaded": len(self._images),
+            "converted": len(self._converted),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "load_ms": sum(self.load_times.values()) * 1000,
+        }
+
+
+def _scale(image, width, height):
+    original_width, original_height = image.get_size()
+    if width:
+        height = int(original_height * (width / original_width))
+    elif height:
+        width = int(original_width * (height / original_height))
+    else:
+        return image
+    return pygame.transform.scale(image, (width, height))
+
+
+def _save(image, path):
+    # Written under a temporary name first, so a concurrent or interrupted
+    # run never loads half a file.
+    temporary_path = f"{path}.{os.getpid()}.png"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pygame.image.save(image, temporary_path)
+        os.replace(temporary_path, path)
+    except (OSError, pygame.error):
+        pass
@@ -1,4 +1,5 @@
-import pygame
+from graphics.assets import AssetManager
+from graphics.fonts import get_font
 
 # From catppuccin theme
 MAUVE = (203, 166, 247)
@@ -21,78 +22,52 @@ GRAY = (200, 200, 200)
 RED = (255, 0, 0)
 
 
-def scale_by_height(image: pygame.Surface, new_height: int) -> pygame.Surface:
-    original_width = image.get_width()
-    original_height = image.get_height()
-
-    new_width = int(original_width * (new_height / original_height))
-
-    scaled_image = pygame.transform.scale(image, (new_width, new_height))
-
-    return scaled_image
-
-
-def scale_by_width(image: pygame.Surface, new_width: int) -> pygame.Surface:
-    original_width = image.get_width()
-    original_height = image.get_height()
-
-    new_height = int(original_height * (new_width / original_width))
-
-    scaled_image = pygame.transform.scale(image, (new_width, new_height))
-
-    return scaled_image
-
-
 PLAYER_HEIGHT = 125
 
-
-def load_blob(image_name):
-    blob_image_unprocessed = pygame.image.load(
-        f"./assets/images/blobs/{image_name}.png"
-    )
-    blob_image = scale_by_height(blob_image_unprocessed, PLAYER_HEIGHT)
-    blob_image_pressed = scale_by_height(blob_image_unprocessed, PLAYER_HEIGHT + 10)
-    return blob_image, blob_image_pressed
-
-
-pygame.init()
-
-MAIN_FONT = pygame.font.Font(None, 32)
-DETAILS_FONT = pygame.font.Font(pygame.font.match_font("arial"), 20)
+MAIN_FONT = get_font(None, 32)
+DETAILS_FONT = get_font("arial", 20)
 
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 
-blob_colors = {
-    "white": load_blob("blob_white"),
-    "green": load_blob("blob_green"),
-    "lavender": load_blob("blob_lavender"),
-    "maroon": load_blob("blob_maroon"),
-    "yellow": load_blob("blob_yellow"),
-    "gradient": load_blob("blob_gradient"),
-}
+BLOB_COLORS = ("white", "green", "lavender", "maroon", "yellow", "gradient")
 DEFAULT_BLOB_COLOR = "white"
 
-blob_image = blob_colors[DEFAULT_BLOB_COLOR][0]
+DANCE_BUTTON_WIDTH = 250
+LOGO_WIDTH = 600
 
-sad_face_image = pygame.image.load("./assets/images/sad_face.png")
-sad_face_image = scale_by_width(sad_face_image, blob_image.get_width() - 30)
+assets = AssetManager()
 
-neutral_face_image = pygame.image.load("./assets/images/neutral_face.png")
-neutral_face_image = scale_by_width(neutral_face_image, blob_image.get_width() - 30)
+for color in BLOB_COLORS:
+    assets.register(
+        f"blob_{color}",
+        f"./assets/images/blobs/blob_{color}.png",
+        height=PLAYER_HEIGHT,
+    )
+    assets.register(
+        f"blob_{color}_pressed",
+        f"./assets/images/blobs/blob_{color}.png",
+        height=PLAYER_HEIGHT + 10,
+    )
 
-happy_face_image = pygame.image.load("./assets/images/happy_face.png")
-happy_face_image = scale_by_height(happy_face_image, 50)
 
-DANCE_BUTTON_WIDTH = 250
-dance_button_image = pygame.image.load("./assets/images/dance_button.png")
-dance_button_image = scale_by_width(dance_button_image, DANCE_BUTTON_WIDTH)
+def face_width():
+    return assets.get(f"blob_{DEFAULT_BLOB_COLOR}").get_width() - 30
 
-LOGO_WIDTH = 600
-logo_image = pygame.image.load("./assets/images/logo.png")
-logo_image = scale_by_width(logo_image, LOGO_WIDTH)
 
-mark_overlay_image = pygame.image.load("./assets/images/mark_overlay.png")
+assets.register("sad_face", "./assets/images/sad_face.png", width=face_width)
+assets.register("neutral_face", "./assets/images/neutral_face.png", width=face_width)
+assets.register("happy_face", "./assets/images/happy_face.png", height=50)
+assets.register(
+    "dance_button", "./assets/images/dance_button.png", width=DANCE_BUTTON_WIDTH
+)
+assets.register("logo", "./assets/images/logo.png", width=LOGO_WIDTH)
+assets.register("mark_overlay", "./assets/images/mark_overlay.png")
+assets.register("move_icon", "./assets/images/move_icon.png", width=30)
+
 
-move_icon_image = pygame.image.load("./assets/images/move_icon.png")
-move_icon_image = scale_by_width(move_icon_image, 30)
+def get_blob_images(color):
+    """Returns the (regular, pressed) blob images of a player color."""
+    if color not in BLOB_COLORS:
+        color = DEFAULT_BLOB_COLOR
+    return assets.get(f"blob_{color}"), assets.get(f"blob_{color}_pressed")
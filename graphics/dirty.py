@@ -0,0 +1,44 @@
+import pygame
+
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT
+
+# When the rectangles drawn in a frame add up to more than this share of the
+# screen, the whole screen is repainted and updated instead.
+MAX_DIRTY_FRACTION = 0.5
+
+
+class DirtyRects:
+    """Limits repainting to the parts of the screen that were drawn on.
+
+    begin() paints the background back only under what was drawn the frame
+    before; end() takes the rectangles drawn this frame and returns the
+    areas of the display to update, i.e. both frames' rectangles.
+    """
+
+    def __init__(self, background):
+        self.background = background
+        self.screen_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.previous = []
+        self.full_redraw = True
+
+    def begin(self, surface):
+        if self.full_redraw:
+            surface.fill(self.background)
+            return
+        for rect in self.previous:
+            surface.fill(self.background, rect)
+
+    def end(self, rects):
+        rects = [rect.clip(self.screen_rect) for rect in rects if rect]
+        dirty = self.previous + rects
+        was_full_redraw = self.full_redraw
+        self.previous = rects
+
+        # Filling many overlapping rectangles next frame would cost more than
+        # filling the whole screen once.
+        area = sum(rect.width * rect.height for rect in rects)
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        self.full_redraw = area > screen_area * MAX_DIRTY_FRACTION
+        if was_full_redraw or self.full_redraw:
+            return [self.screen_rect]
+        return dirty
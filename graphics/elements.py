@@ -3,7 +3,7 @@ import pygame
 from graphics.common import (
     BLACK,
     MAIN_FONT,
-    dance_button_image,
+    assets,
     SCREEN_WIDTH,
     DANCE_BUTTON_WIDTH,
     MAROON,
@@ -14,6 +14,7 @@ from graphics.common import (
     MANTLE,
     DETAILS_FONT, SCREEN_HEIGHT,
 )
+from graphics.text import render_text
 
 BORDER_RADIUS = 5
 
@@ -43,9 +44,9 @@ class InputField:
         )
 
         if self.text:
-            text_surface = MAIN_FONT.render(self.text, True, TEXT_COLOR)
+            text_surface = render_text(MAIN_FONT, self.text, True, TEXT_COLOR)
         else:
-            text_surface = MAIN_FONT.render(self.hint, True, HINT_COLOR)
+            text_surface = render_text(MAIN_FONT, self.hint, True, HINT_COLOR)
 
         surface.blit(text_surface, (self.rect.x + 10, self.rect.y + 14))
 
@@ -62,52 +63,104 @@ class Button:
     def draw(self, surface):
         pygame.draw.rect(surface, LAVENDER, self.rect, border_radius=BORDER_RADIUS)
 
-        text_surface = MAIN_FONT.render(self.text, True, MANTLE)
+        text_surface = render_text(MAIN_FONT, self.text, True, MANTLE)
         surface.blit(text_surface, (self.rect.x + 10, self.rect.y + 14))
 
 
 class DanceButton:
     def __init__(self):
         padding = 15
-        height = dance_button_image.get_height()
+        height = assets.get("dance_button").get_height()
         self.rect = pygame.Rect(
             SCREEN_WIDTH - padding - DANCE_BUTTON_WIDTH,
             padding,
             DANCE_BUTTON_WIDTH,
             height,
         )
+        self.stop_image = None
 
-    def draw(self, surface, is_dancing):
+    def _render_stop_image(self):
+        stop_image = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(stop_image, MAROON, stop_image.get_rect(), border_radius=8)
 
-        if is_dancing:
-            pygame.draw.rect(surface, MAROON, self.rect, border_radius=8)
+        text_surface = render_text(MAIN_FONT, "Stop", True, BLACK)
+        text_padding = 15
+        stop_image.blit(text_surface, (text_padding, text_padding))
+        if pygame.display.get_surface():
+            stop_image = stop_image.convert_alpha()
+        return stop_image
 
-            text_surface = MAIN_FONT.render("Stop", True, BLACK)
-            text_padding = 15
-            surface.blit(
-                text_surface, (self.rect.x + text_padding, self.rect.y + text_padding)
-            )
+    def draw(self, surface, is_dancing):
+        if is_dancing:
+            if self.stop_image is None:
+                self.stop_image = self._render_stop_image()
+            return surface.blit(self.stop_image, (self.rect.x, self.rect.y))
         else:
-            surface.blit(dance_button_image, (self.rect.x, self.rect.y))
+            return surface.blit(assets.get("dance_button"), (self.rect.x, self.rect.y))
 
 
 def draw_song_name(surface, name):
-    text_surface = DETAILS_FONT.render(f"♪ {name} ♪", True, TEXT_COLOR)
+    text_surface = render_text(DETAILS_FONT, f"♪ {name} ♪", True, TEXT_COLOR)
     text_width = text_surface.get_width()
-    surface.blit(text_surface, ((SCREEN_WIDTH - text_width) // 2, 670))
+    return surface.blit(text_surface, ((SCREEN_WIDTH - text_width) // 2, 670))
 
 
 def draw_location_name(surface, name):
-    text_surface = DETAILS_FONT.render(f"{name}", True, TEXT_COLOR)
+    text_surface = render_text(DETAILS_FONT, f"{name}", True, TEXT_COLOR)
     text_width = text_surface.get_width()
-    surface.blit(text_surface, ((SCREEN_WIDTH - text_width) // 2, 25))
+    return surface.blit(text_surface, ((SCREEN_WIDTH - text_width) // 2, 25))
 
 
 def display_leaderboard(surface, scores):
     sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
     y_offset = SCREEN_HEIGHT - 200
+    rects = []
     for i, (player, score) in enumerate(sorted_scores):
         number = i + 1
         rank = f"{number}) {player}: {score}"
-        text = DETAILS_FONT.render(rank, True, TEXT_COLOR)
-        surface.blit(text, (10, y_offset + i * 40))
+        text = render_text(DETAILS_FONT, rank, True, TEXT_COLOR)
+        rects.append(surface.blit(text, (10, y_offset + i * 40)))
+    return rects[0].unionall(rects[1:]) if rects else None
+
+
+def draw_latency(surface, rtt_ms):
+    label = "RTT --" if rtt_ms is None else f"RTT {rtt_ms:.0f} ms"
+    text_surface = render_text(DETAILS_FONT, label, True, HINT_COLOR)
+    return surface.blit(text_surface, (10, 10))
+
+
+def _format_stat(value):
+    if isinstance(value, float):
+        return f"{value:.3g}"
+    return str(value)
+
+
+def draw_stats_overlay(surface, stats):
+    lines = []
+    for section, values in stats.items():
+        if isinstance(values, dict):
+            summary = ", ".join(
+                f"{name}={_format_stat(value)}"
+                for name, value in values.items()
+                if not isinstance(value, dict)
+            )
+            lines.append(f"{section}: {summary}")
+            for name, value in values.items():
+                if isinstance(value, dict):
+                    histogram = " ".join(
+                        f"{key}={_format_stat(item)}" for key, item in value.items()
+                    )
+                    lines.append(f"  {name}: {histogram}")
+        else:
+            lines.append(f"{section}: {_format_stat(values)}")
+
+    text_surfaces = [DETAILS_FONT.render(line, True, TEXT_COLOR) for line in lines]
+    line_height = DETAILS_FONT.get_linesize()
+    width = max(text_surface.get_width() for text_surface in text_surfaces)
+    overlay = pygame.Surface(
+        (width + 20, line_height * len(lines) + 20), pygame.SRCALPHA
+    )
+    overlay.fill((*MANTLE, 220))
+    for i, text_surface in enumerate(text_surfaces):
+        overlay.blit(text_surface, (10, 10 + i * line_height))
+    return surface.blit(overlay, (10, 40))
@@ -0,0 +1,26 @@
+import pygame
+
+_paths = {}
+_fonts = {}
+
+
+def _font_path(name):
+    # match_font scans the system fonts, so it is only asked once per name.
+    if name not in _paths:
+        _paths[name] = pygame.font.match_font(name)
+    return _paths[name]
+
+
+def get_font(name, size):
+    """Returns the system font `name` (None for pygame's default) at `size`.
+
+    Every font is resolved and loaded from disk once per process.
+    """
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        path = None if name is None else _font_path(name)
+        font = _fonts[key] = pygame.font.Font(path, size)
+    return font
@@ -0,0 +1,196 @@
+import time
+
+import numpy as np
+
+from models import PlayerState
+from network.codec import STATUSES, STATUS_CODES, MARKS, MARK_CODES
+
+INITIAL_CAPACITY = 64
+COLUMNS = (
+    "target",
+    "origin",
+    "position",
+    "velocity",
+    "updated_at",
+    "status",
+    "mark",
+    "cell",
+)
+
+# Positions are extrapolated at most this far (s) past the last update, which
+# bounds the error when a player stops and the next state is late or lost.
+MAX_EXTRAPOLATION = 0.25
+# Weight of the newest sample in the smoothed velocity.
+VELOCITY_SMOOTHING = 0.5
+# Faster than this (px/s) is a teleport, not movement worth extrapolating.
+MAX_SPEED = 1500
+# A moving player whose new state is this far (px) from the predicted position
+# is snapped to it instead of eased.
+SNAP_DISTANCE = 200
+# Grid cell of players not filed in a spatial grid yet.
+NO_CELL = np.iinfo(np.int64).min
+
+
+class PlayerStore:
+    """Columnar storage for every player on the floor.
+
+    Each player owns one row of the arrays below, found through `rows`.
+    Removing a player moves the last row into the freed one, so rows are
+    always packed and per-frame work is a handful of vectorized operations.
+
+    Between updates, positions are dead-reckoned from a velocity estimated
+    over successive states, so motion stays smooth at low tick rates. When
+    states are played back from a jitter buffer, positions are instead
+    blended between each player's previous (`origin`) and current target.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.rows = {}
+        self.user_ids = []
+        self.target = np.zeros((capacity, 2))
+        self.origin = np.zeros((capacity, 2))
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.updated_at = np.zeros(capacity)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.mark = np.zeros(capacity, dtype=np.int8)
+        self.cell = np.full((capacity, 2), NO_CELL, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return user_id in self.rows
+
+    def _grow(self):
+        capacity = len(self.target) * 2
+        for name in COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros((capacity, *column.shape[1:]), dtype=column.dtype)
+            grown[: len(column)] = column
+            setattr(self, name, grown)
+
+    def add(self, state: PlayerState, now=None):
+        if now is None:
+            now = time.monotonic()
+        if len(self.user_ids) == len(self.target):
+            self._grow()
+        row = len(self.user_ids)
+        self.rows[state.user_id] = row
+        self.user_ids.append(state.user_id)
+        self.target[row] = (state.longitude, state.latitude)
+        self.position[row] = self.origin[row] = self.target[row]
+        self.velocity[row] = 0
+        self.updated_at[row] = now
+        self.cell[row] = NO_CELL
+        self.update(state, now)
+        return row
+
+    def update(self, state: PlayerState, now=None):
+        if now is None:
+            now = time.monotonic()
+        row = self.rows[state.user_id]
+        target = np.array((state.longitude, state.latitude))
+        elapsed = now - self.updated_at[row]
+        velocity = np.zeros(2)
+        if elapsed > 0:
+            velocity = (target - self.target[row]) / elapsed
+        if self.velocity[row].any():
+            predicted = self.target[row] + self.velocity[row] * min(
+                elapsed, MAX_EXTRAPOLATION
+            )
+            if np.hypot(*(target - predicted)) > SNAP_DISTANCE:
+                self.position[row] = target
+        if np.hypot(*velocity) > MAX_SPEED:
+            # Teleports are eased toward, like any other jump.
+            self.velocity[row] = 0
+        else:
+            self.velocity[row] += (velocity - self.velocity[row]) * VELOCITY_SMOOTHING
+        self.origin[row] = self.target[row]
+        self.target[row] = target
+        self.updated_at[row] = now
+        self.status[row] = STATUS_CODES.get(state.status, 0)
+        self.mark[row] = MARK_CODES.get(state.last_mark, 0)
+
+    def update_rows(self, rows, targets, status, mark, now=None):
+        """Updates many players at once, as update() does one by one.
+
+        `targets` holds a (longitude, latitude) row per player, `status` and
+        `mark` their codes.
+        """
+        if now is None:
+            now = time.monotonic()
+        elapsed = now - self.updated_at[rows]
+        previous = self.target[rows]
+        velocity = np.zeros_like(targets)
+        moving = elapsed > 0
+        velocity[moving] = (targets[moving] - previous[moving]) / elapsed[moving, None]
+        smoothed = self.velocity[rows]
+        predicted = (
+            previous + smoothed * np.minimum(elapsed, MAX_EXTRAPOLATION)[:, None]
+        )
+        snapped = smoothed.any(axis=1) & (
+            np.hypot(*(targets - predicted).T) > SNAP_DISTANCE
+        )
+        self.position[rows[snapped]] = targets[snapped]
+        smoothed += (velocity - smoothed) * VELOCITY_SMOOTHING
+        # Teleports are eased toward, like any other jump.
+        smoothed[np.hypot(*velocity.T) > MAX_SPEED] = 0
+        self.velocity[rows] = smoothed
+        self.origin[rows] = previous
+        self.target[rows] = targets
+        self.updated_at[rows] = now
+        self.status[rows] = status
+        self.mark[rows] = mark
+
+    def remove(self, user_id):
+        row = self.rows.pop(user_id)
+        last_row = len(self.user_ids) - 1
+        last_user_id = self.user_ids.pop()
+        if row != last_row:
+            for name in COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last_row]
+            self.user_ids[row] = last_user_id
+            self.rows[last_user_id] = row
+
+    def clear(self):
+        self.rows.clear()
+        self.user_ids.clear()
+
+    def get_position(self, user_id):
+        x, y = self.position[self.rows[user_id]].tolist()
+        return x, y
+
+    def get_status(self, user_id):
+        return STATUSES[self.status[self.rows[user_id]]]
+
+    def get_mark(self, user_id):
+        return MARKS[self.mark[self.rows[user_id]]]
+
+    def interpolate(self, speed, now=None):
+        """Eases every position toward where its player is predicted to be."""
+        if now is None:
+            now = time.monotonic()
+        count = len(self.user_ids)
+        elapsed = np.clip(now - self.updated_at[:count], 0, MAX_EXTRAPOLATION)
+        predicted = self.target[:count] + self.velocity[:count] * elapsed[:, None]
+        position = self.position[:count]
+        position += (predicted - position) * speed
+
+    def changed_cells(self, cell_size):
+        """Returns the rows whose position moved to another grid cell, and those cells.
+
+        The cells are remembered, so each move is only reported once.
+        """
+        count = len(self.user_ids)
+        cells = np.floor_divide(self.position[:count], cell_size).astype(np.int64)
+        rows = np.nonzero((cells != self.cell[:count]).any(axis=1))[0]
+        self.cell[rows] = cells[rows]
+        return rows, cells[rows]
+
+    def blend(self, alpha):
+        """Places every player `alpha` of the way from its origin to its target."""
+        count = len(self.user_ids)
+        origin = self.origin[:count]
+        self.position[:count] = origin + (self.target[:count] - origin) * alpha
@@ -0,0 +1,57 @@
+import pygame
+
+# Layers of the dance floor, drawn from the lowest up.
+FLOOR_LAYER = 0
+PLAYER_LAYER = 1
+HUD_LAYER = 2
+
+
+class RenderList:
+    """Collects the blits of a frame and submits them in one Surface.blits call.
+
+    Elements draw onto a layer returned by layer(), which has the same blit()
+    as a Surface, so they work with either. Blits within a layer keep their
+    order; layers are drawn from the lowest up.
+    """
+
+    def __init__(self):
+        self._layers = {}
+
+        self.submitted = 0
+        self.batches = 0
+
+    def layer(self, layer):
+        blits = self._layers.get(layer)
+        if blits is None:
+            blits = self._layers[layer] = []
+        return RenderLayer(blits)
+
+    def submit(self, surface):
+        blits = []
+        for layer in sorted(self._layers):
+            blits.extend(self._layers[layer])
+            self._layers[layer].clear()
+        if blits:
+            surface.blits(blits, doreturn=False)
+            self.submitted += len(blits)
+            self.batches += 1
+        return len(blits)
+
+    def get_stats(self):
+        return {
+            "blits": self.submitted,
+            "batches": self.batches,
+            "per_batch": self.submitted / self.batches if self.batches else 0.0,
+        }
+
+
+class RenderLayer:
+    def __init__(self, blits):
+        self._blits = blits
+
+    def blit(self, source, dest, area=None):
+        """Queues the blit and returns the rectangle it will cover, unclipped."""
+        self._blits.append((source, dest, area))
+        if area is None:
+            return pygame.Rect(dest, source.get_size())
+        return pygame.Rect(dest, area.size)
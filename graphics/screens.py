@@ -1,6 +1,9 @@
+import math
 import os
 import time
+from collections import OrderedDict
 
+import numpy as np
 import pygame
 
 from graphics.common import (
@@ -11,18 +14,13 @@ from graphics.common import (
     MAROON,
     GREEN,
     PLAYER_HEIGHT,
-    happy_face_image,
-    logo_image,
     LOGO_WIDTH,
     SCREEN_WIDTH,
     DETAILS_FONT,
     TEXT_COLOR,
     BAR_COLOR,
-    mark_overlay_image,
-    neutral_face_image,
-    sad_face_image,
-    move_icon_image,
-    blob_colors,
+    assets,
+    get_blob_images,
     DEFAULT_BLOB_COLOR,
 )
 from graphics.elements import (
@@ -30,14 +28,36 @@ from graphics.elements import (
     Button,
     DanceButton,
     draw_song_name,
-    draw_location_name, display_leaderboard,
+    draw_location_name,
+    display_leaderboard,
+    draw_latency,
+    draw_stats_overlay,
 )
+from graphics.dirty import DirtyRects
+from graphics.fonts import get_font
+from graphics.player_store import PlayerStore
+from graphics.render_list import RenderList, FLOOR_LAYER, PLAYER_LAYER, HUD_LAYER
+from graphics.spatial import SpatialGrid
+from graphics.viewport import Viewport
+from graphics.text import render_text, text_cache
 from models import PlayerState, GameState, SongState
 from network.auth import login
-from network.udp import initialize_client, issue_move, change_status, issue_mark
+from network.jitter import JitterBuffer
+from network.mailbox import StateMailbox
+from network.offload import PlayerRecords
+from network.udp import (
+    JITTER_BUFFER_DELAY,
+    initialize_client,
+    issue_move,
+    change_status,
+    issue_mark,
+    get_link_stats,
+    get_stats,
+    poll_offloaded_state,
+)
 import pygame.gfxdraw
 
-from typing import List
+from typing import Dict, List
 
 from enum import Enum
 
@@ -113,14 +133,14 @@ class LoginScreen(Screen):
 
     def draw(self, surface):
         surface.fill(MANTLE)
-        surface.blit(logo_image, (SCREEN_WIDTH / 2 - LOGO_WIDTH / 2, 100))
+        surface.blit(assets.get("logo"), (SCREEN_WIDTH / 2 - LOGO_WIDTH / 2, 100))
 
         self.username_field.draw(surface)
         self.password_field.draw(surface)
         self.login_button.draw(surface)
 
         if self.error:
-            error_surface = DETAILS_FONT.render(self.error, True, MAROON)
+            error_surface = render_text(DETAILS_FONT, self.error, True, MAROON)
             surface.blit(error_surface, (15, 15))
 
 
@@ -140,90 +160,189 @@ def coordinates_to_remote(position):
     return x, y
 
 
+# Bounds of the composited player sprites: at most two beat phases and five
+# faces per player, at up to ~80 KiB each.
+PLAYER_SPRITE_ENTRIES = 2048
+PLAYER_SPRITE_BYTES = 64 * 1024 * 1024
+
+
+class PlayerSpriteCache:
+    """Least-recently-used cache of players drawn as a single surface.
+
+    A sprite composites the blob (pressed or not), the face of the last
+    mark and the username label, so drawing a player is one blit. Sprites
+    are keyed by everything they show and dropped through invalidate() when
+    a player's username or color changes.
+    """
+
+    def __init__(
+        self, max_entries=PLAYER_SPRITE_ENTRIES, max_bytes=PLAYER_SPRITE_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sprites = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, state: PlayerState, mark, pressed, scale=1.0):
+        """Returns the sprite and the offset of its top left from the blob center."""
+        key = (
+            state.username,
+            state.color,
+            state.is_main,
+            pressed,
+            mark,
+            scale,
+        )
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        if scale == 1.0:
+            sprite = _composite_player(state, mark, pressed)
+        else:
+            sprite = _scale_sprite(self.get(state, mark, pressed), scale)
+        self._sprites[key] = sprite
+        self.bytes += _sprite_bytes(sprite)
+        while len(self._sprites) > self.max_entries or (
+            self.bytes > self.max_bytes and len(self._sprites) > 1
+        ):
+            _, evicted = self._sprites.popitem(last=False)
+            self.bytes -= _sprite_bytes(evicted)
+            self.evictions += 1
+        return sprite
+
+    def invalidate(self, username, color):
+        for key in [key for key in self._sprites if key[:2] == (username, color)]:
+            self.bytes -= _sprite_bytes(self._sprites.pop(key))
+            self.invalidations += 1
+
+    def clear(self):
+        self._sprites.clear()
+        self.bytes = 0
+
+    def get_stats(self):
+        return {
+            "entries": len(self._sprites),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def _sprite_bytes(sprite):
+    surface, _ = sprite
+    return surface.get_pitch() * surface.get_height()
+
+
+def _composite_player(state: PlayerState, mark, pressed):
+    blob_image = get_blob_images(state.color)[1 if pressed else 0]
+    face_image = assets.get(MARK_FACES.get(mark, "neutral_face"))
+    username_color = GREEN if state.is_main else TEXT_COLOR
+    username_text = render_text(DETAILS_FONT, state.username, True, username_color)
+    text_width, text_height = username_text.get_size()
+
+    # Laid out around the blob center, as Player.draw used to blit them.
+    layers = [
+        (blob_image, blob_image.get_rect(center=(0, 0))),
+        (face_image, face_image.get_rect(center=(0, -10))),
+        (
+            username_text,
+            pygame.Rect(
+                -(text_width // 2),
+                math.floor(-PLAYER_HEIGHT / 2 - text_height - 10),
+                text_width,
+                text_height,
+            ),
+        ),
+    ]
+    bounds = layers[0][1].unionall([rect for _, rect in layers[1:]])
+    surface = pygame.Surface(bounds.size, pygame.SRCALPHA)
+    for image, rect in layers:
+        surface.blit(image, rect.move(-bounds.x, -bounds.y))
+    if pygame.display.get_surface():
+        surface = surface.convert_alpha()
+    # Sprites are never drawn on once built, so they can be run-length
+    # encoded, which skips their transparent pixels when blitting.
+    surface.set_alpha(255, pygame.RLEACCEL)
+    return surface, bounds.topleft
+
+
+def _scale_sprite(sprite, scale):
+    surface, (offset_x, offset_y) = sprite
+    width, height = surface.get_size()
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    surface = pygame.transform.smoothscale(surface, size)
+    surface.set_alpha(255, pygame.RLEACCEL)
+    return surface, (round(offset_x * scale), round(offset_y * scale))
+
+
+player_sprites = PlayerSpriteCache()
+
+
 class Player:
-    def _get_images(self):
-        images = blob_colors[self.state.color]
-        if images is None:
-            return blob_colors[DEFAULT_BLOB_COLOR]
-        return images
+    def __init__(self, state: PlayerState, bpm, store: PlayerStore):
+        self.store = store
+        self.reset(state, bpm)
 
-    def __init__(self, state: PlayerState, bpm):
+    def reset(self, state: PlayerState, bpm):
+        """Prepares the element for a (possibly different) player joining."""
         self.state = state
         self.user_id = state.user_id
-        self.position = (state.longitude, state.latitude)
-        self.bpm = bpm
-        self.image = self._get_images()[0]
+        self.pressed = False
+        self.last_count_time = time.time()
+        self.set_bpm(bpm)
 
+    def set_bpm(self, bpm):
+        self.bpm = bpm
         if bpm:
             self.count_duration = 60 / bpm
-            self.last_count_time = time.time()
 
-        self.mark_faces = {
-            Mark.PERFECT.value: happy_face_image,
-            Mark.GOOD.value: neutral_face_image,
-            Mark.BAD.value: sad_face_image,
-            Mark.MISS.value: sad_face_image,
-        }
+    @property
+    def position(self):
+        return self.store.get_position(self.user_id)
 
     def update_state(self, state: PlayerState):
+        if (state.username, state.color) != (self.state.username, self.state.color):
+            player_sprites.invalidate(self.state.username, self.state.color)
         self.state = state
+        self.store.update(state)
 
-    def _interpolate_position(self):
-        shadow_x, shadow_y = (self.state.longitude, self.state.latitude)
-        current_x, current_y = self.position
-
-        delta_x = shadow_x - current_x
-        delta_y = shadow_y - current_y
-
-        move_x = current_x + delta_x * INTERPOLATION_SPEED
-        move_y = current_y + delta_y * INTERPOLATION_SPEED
-
-        self.position = (int(move_x), int(move_y))
-
-    def _draw_blob(self, surface, x, y):
+    def _update_beat(self):
         elapsed_time = time.time() - self.last_count_time
-        blob_image, blob_image_pressed = self._get_images()
+        status = self.store.get_status(self.user_id)
 
-        if self.state.status == PlayerStatus.IDLE.value:
-            self.image = blob_image
+        if status == PlayerStatus.IDLE.value:
+            self.pressed = False
 
-        if self.bpm and self.state.status == PlayerStatus.DANCING.value:
+        if self.bpm and status == PlayerStatus.DANCING.value:
             if elapsed_time - self.count_duration >= -0.01:
                 self.last_count_time = time.time()
-
-                if self.image == blob_image:
-                    self.image = blob_image_pressed
-                else:
-                    self.image = blob_image
-
-        blob_image_rect = self.image.get_rect(center=(x, y))
-        surface.blit(self.image, blob_image_rect.topleft)
+                self.pressed = not self.pressed
 
     def sync_with_song(self, playback_position: float):
         elapsed_in_count = playback_position % self.count_duration
         self.last_count_time = time.time() - elapsed_in_count
 
-    def draw(self, surface):
-        self._interpolate_position()
-        x, y = coordinates_to_local(self.position)
-        if not self.state.last_mark:
-            face_image = neutral_face_image
-        else:
-            face_image = self.mark_faces[self.state.last_mark]
-
-        self._draw_blob(surface, x, y)
-
-        face_image_rect = face_image.get_rect(center=(x, y - 10))
-        surface.blit(face_image, face_image_rect.topleft)
-
-        username_color = GREEN if self.state.is_main else TEXT_COLOR
-        username_text = DETAILS_FONT.render(self.state.username, True, username_color)
-        text_width, text_height = username_text.get_size()
-
-        text_x = x - text_width // 2
-        text_y = y - PLAYER_HEIGHT / 2 - text_height - 10
-
-        surface.blit(username_text, (text_x, text_y))
+    def draw(self, surface, viewport: Viewport):
+        x, y = viewport.to_screen(*coordinates_to_local(self.position))
+        self._update_beat()
+        sprite, (offset_x, offset_y) = player_sprites.get(
+            self.state,
+            self.store.get_mark(self.user_id),
+            self.pressed,
+            viewport.zoom,
+        )
+        return surface.blit(sprite, (x + offset_x, y + offset_y))
 
 
 def play_song(song: SongState, start=0):
@@ -236,6 +355,67 @@ def play_song(song: SongState, start=0):
         print(f"Song {song.id} not found!")
 
 
+ARROW_SYMBOLS = ["←", "↑", "→", "↓"]
+ARROW_FONT_SIZE = 36
+ARROW_ATLAS_COLORKEY = (255, 0, 255)
+
+
+def get_arrow_symbol(direction_code):
+    inverted = direction_code < 0
+    symbol = ARROW_SYMBOLS[abs(direction_code)]
+    if inverted:
+        symbol = symbol.lower()
+    return symbol
+
+
+class ArrowAtlas:
+    """Every arrow circle of one radius, pre-rendered onto a single surface.
+
+    There is one cell per direction code (negative codes are inverted
+    arrows) and pressed state, so drawing an arrow is a single blit.
+    """
+
+    def __init__(self, radius):
+        self.radius = radius
+        size = radius * 2 + 1
+        codes = range(1 - len(ARROW_SYMBOLS), len(ARROW_SYMBOLS))
+        self.surface = pygame.Surface((size * len(codes), size * 2))
+        # Circles are not antialiased, so a colorkey keeps the corners
+        # transparent at a fraction of the cost of per-pixel alpha.
+        self.surface.fill(ARROW_ATLAS_COLORKEY)
+        self.cells = {}
+
+        font = get_font("arial", ARROW_FONT_SIZE)
+        for column, direction_code in enumerate(codes):
+            for row, pressed in enumerate((False, True)):
+                cell = pygame.Rect(column * size, row * size, size, size)
+                self._draw_arrow(font, cell, direction_code, pressed)
+                self.cells[direction_code, pressed] = cell
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert()
+        self.surface.set_colorkey(ARROW_ATLAS_COLORKEY, pygame.RLEACCEL)
+
+    def _draw_arrow(self, font, cell, direction_code, pressed):
+        unpressed_color = BLUE if direction_code >= 0 else MAROON
+        circle_color = GREEN if pressed else unpressed_color
+        pygame.gfxdraw.filled_circle(
+            self.surface, cell.centerx, cell.centery, self.radius, circle_color
+        )
+
+        text = font.render(get_arrow_symbol(direction_code), True, MANTLE)
+        self.surface.blit(text, text.get_rect(center=cell.center))
+
+
+_arrow_atlases = {}
+
+
+def get_arrow_atlas(radius):
+    atlas = _arrow_atlases.get(radius)
+    if atlas is None:
+        atlas = _arrow_atlases[radius] = ArrowAtlas(radius)
+    return atlas
+
+
 class ArrowCircle:
     def __init__(self, x, y, direction_code, radius=40):
         self.x = x
@@ -243,26 +423,17 @@ class ArrowCircle:
         self.radius = radius
         self.direction_code = direction_code
         self.pressed = False
-        self.arrow_symbols = ["←", "↑", "→", "↓"]
-        self.font = pygame.font.Font(pygame.font.match_font("arial"), 36)
 
     def get_arrow_symbol(self):
-        inverted = self.direction_code < 0
-        index = abs(self.direction_code)
-        symbol = self.arrow_symbols[index]
-        if inverted:
-            symbol = symbol.lower()
-        return symbol
+        return get_arrow_symbol(self.direction_code)
 
     def draw(self, surface):
-        unpressed_color = BLUE if self.direction_code >= 0 else MAROON
-        circle_color = GREEN if self.pressed else unpressed_color
-        pygame.gfxdraw.filled_circle(surface, self.x, self.y, self.radius, circle_color)
-
-        symbol = self.get_arrow_symbol()
-        text = self.font.render(symbol, True, MANTLE)
-        text_rect = text.get_rect(center=(self.x, self.y))
-        surface.blit(text, text_rect)
+        atlas = get_arrow_atlas(self.radius)
+        return surface.blit(
+            atlas.surface,
+            (self.x - self.radius, self.y - self.radius),
+            atlas.cells[self.direction_code, self.pressed],
+        )
 
 
 class ArrowDisplay:
@@ -300,10 +471,12 @@ class ArrowDisplay:
             self.arrows.append(ArrowCircle(x, y, direction_code, self.circle_radius))
 
     def draw(self, surface):
+        rects = []
         for idx in range(len(self.arrows)):
             arrow = self.arrows[idx]
             arrow.pressed = idx <= self.last_pressed
-            arrow.draw(surface)
+            rects.append(arrow.draw(surface))
+        return rects[0].unionall(rects[1:]) if rects else None
 
     def handle_keydown(self, key):
         pressed_direction = self.key_mapping.get(key)
@@ -338,6 +511,15 @@ class PlayerStatus(Enum):
     IDLE = "idle"
 
 
+# Faces drawn on player sprites after each mark.
+MARK_FACES = {
+    Mark.PERFECT.value: "happy_face",
+    Mark.GOOD.value: "neutral_face",
+    Mark.BAD.value: "sad_face",
+    Mark.MISS.value: "sad_face",
+}
+
+
 BAR_WIDTH = 300
 BAR_HEIGHT = 20
 BAR_Y = 600
@@ -361,10 +543,30 @@ class BPMBar:
         )
         interval_end_x = self.bar_x + self.mark_boundaries[Mark.BAD][1] * BAR_WIDTH
 
-        self.mark_overlay_image = pygame.transform.scale(
-            mark_overlay_image, (interval_end_x - self.interval_start_x, BAR_HEIGHT)
+        mark_overlay_image = pygame.transform.scale(
+            assets.get("mark_overlay"),
+            (interval_end_x - self.interval_start_x, BAR_HEIGHT),
         )
 
+        # Pre-rendered, so drawing the bar is only blits.
+        self.bar_image = pygame.Surface((BAR_WIDTH, BAR_HEIGHT), pygame.SRCALPHA)
+        pygame.draw.rect(
+            self.bar_image, BAR_COLOR, self.bar_image.get_rect(), border_radius=20
+        )
+        self.bar_image.blit(mark_overlay_image, (self.interval_start_x - self.bar_x, 0))
+        self.ball_image = pygame.Surface(
+            (self.ball_radius * 2, self.ball_radius * 2), pygame.SRCALPHA
+        )
+        pygame.draw.circle(
+            self.ball_image,
+            LAVENDER,
+            (self.ball_radius, self.ball_radius),
+            self.ball_radius,
+        )
+        if pygame.display.get_surface():
+            self.bar_image = self.bar_image.convert_alpha()
+            self.ball_image = self.ball_image.convert_alpha()
+
         self.bpm = bpm
         self.count_duration = (COUNTS_PER_PASS * 60) / bpm
         self.last_song_time = time.time()
@@ -384,20 +586,12 @@ class BPMBar:
         ball_x = self.bar_x + self.ball_position * BAR_WIDTH
         ball_y = BAR_Y
 
-        pygame.draw.rect(
-            surface,
-            BAR_COLOR,
-            (self.bar_x, BAR_Y - self.ball_radius, BAR_WIDTH, BAR_HEIGHT),
-            border_radius=20,
-        )
-
-        surface.blit(
-            self.mark_overlay_image, (self.interval_start_x, BAR_Y - self.ball_radius)
-        )
-
-        pygame.draw.circle(
-            surface, LAVENDER, (int(ball_x), int(ball_y)), self.ball_radius
+        bar_rect = surface.blit(self.bar_image, (self.bar_x, BAR_Y - self.ball_radius))
+        ball_rect = surface.blit(
+            self.ball_image,
+            (int(ball_x) - self.ball_radius, int(ball_y) - self.ball_radius),
         )
+        return bar_rect.union(ball_rect)
 
     def sync_with_song(self, playback_position: float):
         elapsed_in_count = playback_position % self.count_duration
@@ -415,6 +609,9 @@ class BPMBar:
         return Mark.MISS
 
 
+MARK_FONT_SIZE = 36
+
+
 class MarkDisplay:
     def __init__(self):
         self.displayed_mark = None
@@ -450,14 +647,17 @@ class MarkDisplay:
 
     def draw(self, surface):
         if self.is_displaying():
-            self._draw_mark(surface, self.displayed_mark)
-        else:
-            self.clear()
+            return self._draw_mark(surface, self.displayed_mark)
+        self.clear()
+        return None
 
     def _draw_mark(self, surface, mark):
-        font = pygame.font.Font(None, 36)
-
-        mark_text = font.render(self.mark_to_text[mark], True, self.mark_to_color[mark])
+        mark_text = render_text(
+            get_font(None, MARK_FONT_SIZE),
+            self.mark_to_text[mark],
+            True,
+            self.mark_to_color[mark],
+        )
 
         bar_x = (SCREEN_WIDTH - BAR_WIDTH) // 2
         text_width = mark_text.get_width()
@@ -465,7 +665,7 @@ class MarkDisplay:
         x_position = bar_x + BAR_WIDTH + text_width / 2
         y_position = BAR_Y - (BAR_HEIGHT // 2)
 
-        surface.blit(mark_text, (x_position, y_position))
+        return surface.blit(mark_text, (x_position, y_position))
 
 
 class MovementIndicator:
@@ -476,18 +676,42 @@ class MovementIndicator:
         self.position = (0, 0)
 
     def show(self, position):
+        """Shows the indicator at a floor position."""
         self.start_time = time.time()
         self.position = position
 
-    def draw(self, surface):
+    def draw(self, surface, viewport: Viewport):
         if time.time() - self.start_time <= self.duration:
-            surface.blit(move_icon_image, self.position)
+            return surface.blit(
+                assets.get("move_icon"), viewport.to_screen(*self.position)
+            )
+        return None
+
+
+# Elements of players who left are kept for reuse, up to this many.
+MAX_POOLED_PLAYERS = 256
+
+# Only repaint and update the parts of the dance floor that were drawn on,
+# instead of the whole screen every frame.
+DIRTY_RECT_RENDERING = os.getenv("DIRTY_RECT_RENDERING", "1") == "1"
+
+# Players this far (floor px) outside the viewport are still drawn, as their
+# sprites reach past their position.
+CULLING_MARGIN = PLAYER_HEIGHT
+
+# Queue the blits of a frame and submit them in one Surface.blits call.
+BATCHED_RENDERING = os.getenv("BATCHED_RENDERING", "1") == "1"
 
 
 class DanceFloorScreen(Screen):
-    def __init__(self, screen_manager):
+    def __init__(self, screen_manager, connect=True):
         self.screen_manager = screen_manager
-        self.player_elements: List[Player] = []
+        self.players: Dict[str, Player] = {}
+        self.player_pool: List[Player] = []
+        self.player_store = PlayerStore()
+        # Store rows of the players of the last offloaded state, by record.
+        self.player_generation = None
+        self.player_rows = None
         self.game_state: GameState | None = None
         self.bpm_bar: BPMBar | None = None
         self.arrow_display = None
@@ -496,10 +720,36 @@ class DanceFloorScreen(Screen):
         self.dance_button = DanceButton()
 
         self.movement_indicator = MovementIndicator()
+        self.show_stats = False
+
+        self.viewport = Viewport()
+        self.spatial_grid = SpatialGrid()
+        self.visible_players = 0
+        self.followed_user_id = None
+        self.panned = False
+        self.dirty_rects = None
+        self.render_list = RenderList() if BATCHED_RENDERING else None
+        if DIRTY_RECT_RENDERING:
+            self.dirty_rects = DirtyRects(MANTLE)
+
+        self.state_mailbox = StateMailbox()
+        self.jitter_buffer = None
+        if JITTER_BUFFER_DELAY:
+            self.jitter_buffer = JitterBuffer(JITTER_BUFFER_DELAY)
+        self.blend_alpha = None
+        if connect:
+            initialize_client(
+                self.screen_manager.user_id,
+                self.screen_manager.token,
+                self.publish_state,
+            )
 
-        initialize_client(
-            self.screen_manager.user_id, self.screen_manager.token, self.update_state
-        )
+    def publish_state(self, game_state):
+        """Hands a received game state over; safe to call from any thread."""
+        if self.jitter_buffer:
+            self.jitter_buffer.publish(game_state)
+        else:
+            self.state_mailbox.publish(game_state)
 
     def _on_pass(self):
         if self.arrow_display:
@@ -520,7 +770,9 @@ class DanceFloorScreen(Screen):
         playback_position = max(0, elapsed_time - song.onset)
         self.bpm_bar.sync_with_song(playback_position)
 
-        self.player_elements = []
+        for player_element in self.players.values():
+            player_element.set_bpm(song.bpm)
+            player_element.sync_with_song(playback_position)
 
     def update_state(self, game_state):
         if game_state and game_state.song:
@@ -532,7 +784,29 @@ class DanceFloorScreen(Screen):
                 self._update_song(game_state.song)
 
         self.game_state = game_state
-        self.update()
+        self._update_players()
+
+    def update(self):
+        poll_offloaded_state(self.publish_state)
+        if self.jitter_buffer:
+            self._update_from_jitter_buffer()
+            return
+        game_state = self.state_mailbox.take()
+        if game_state:
+            self.update_state(game_state)
+
+    def _update_from_jitter_buffer(self):
+        frame = self.jitter_buffer.sample()
+        if frame is None:
+            return
+        previous, current, alpha = frame
+        if current is not self.game_state:
+            if previous is not self.game_state and previous is not current:
+                # States were skipped; blend from the one actually bracketing.
+                self.update_state(previous)
+            self.update_state(current)
+        # During an underrun, players are dead-reckoned instead.
+        self.blend_alpha = alpha if previous is not current else None
 
     def _handle_space_down(self):
         mark = self.bpm_bar.calculate_mark()
@@ -553,13 +827,33 @@ class DanceFloorScreen(Screen):
     def _get_is_dancing(self):
         if not self.game_state:
             return False
-        for player in self.game_state.players:
-            if player.is_main:
-                return player.status == PlayerStatus.DANCING.value
+        for player_element in self.players.values():
+            if player_element.state.is_main:
+                status = self.player_store.get_status(player_element.user_id)
+                return status == PlayerStatus.DANCING.value
         return False
 
+    def player_at(self, position):
+        """Returns the user id of the player drawn at a screen position, if any."""
+        x, y = self.viewport.to_floor(*position)
+        # The grid holds store positions, which are drawn offset by
+        # coordinates_to_local().
+        x -= PLAYER_RADIUS * 2
+        y -= PLAYER_RADIUS * 2
+        width, height = get_blob_images(DEFAULT_BLOB_COLOR)[0].get_size()
+        closest_user_id = None
+        closest_distance = None
+        for user_id in self.spatial_grid.near(x, y):
+            player_x, player_y = self.player_store.get_position(user_id)
+            dx, dy = abs(player_x - x), abs(player_y - y)
+            if dx > width / 2 or dy > height / 2:
+                continue
+            if closest_distance is None or dx + dy < closest_distance:
+                closest_user_id, closest_distance = user_id, dx + dy
+        return closest_user_id
+
     def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if self.dance_button.rect.collidepoint(event.pos):
                 is_dancing = self._get_is_dancing()
                 new_status = PlayerStatus.IDLE if is_dancing else PlayerStatus.DANCING
@@ -569,9 +863,28 @@ class DanceFloorScreen(Screen):
                     new_status.value,
                 )
             else:
-                x, y = coordinates_to_remote(pygame.mouse.get_pos())
+                floor_position = self.viewport.to_floor(*event.pos)
+                x, y = coordinates_to_remote(floor_position)
                 issue_move(self.screen_manager.user_id, self.screen_manager.token, x, y)
-                self.movement_indicator.show(pygame.mouse.get_pos())
+                self.movement_indicator.show(floor_position)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+            self.panned = False
+        elif event.type == pygame.MOUSEMOTION and event.buttons[2]:
+            # Dragging with the right button scrolls the floor.
+            self.viewport.pan(*event.rel)
+            self.panned = True
+            self.followed_user_id = None
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+            # A right click without dragging follows the player under it.
+            if not self.panned:
+                self.followed_user_id = self.player_at(event.pos)
+        elif event.type == pygame.MOUSEWHEEL:
+            self.viewport.zoom_by(event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+            self.viewport.reset()
+            self.followed_user_id = None
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            self.show_stats = not self.show_stats
         elif event.type == pygame.KEYDOWN and self.arrow_display:
             pressed_key = event.key
             if pressed_key == pygame.K_SPACE:
@@ -579,67 +892,164 @@ class DanceFloorScreen(Screen):
             else:
                 self.arrow_display.handle_keydown(pressed_key)
 
-    def _find_player_element(self, user_id):
-        for player in self.player_elements:
-            if player.user_id == user_id:
-                return player
-        return None
-
-    def _update_player(self, state: PlayerState):
-        player_element = self._find_player_element(state.user_id)
-        if player_element:
-            player_element.update_state(state)
-            return player_element
+    def _add_player(self, state: PlayerState):
+        song = self.game_state.song
+        bpm = song.bpm if song else None
+        if self.player_pool:
+            player_element = self.player_pool.pop()
+            player_element.reset(state, bpm)
         else:
-            player_element = Player(
-                state, self.game_state.song.bpm if self.game_state.song else None
+            player_element = Player(state, bpm, self.player_store)
+        self.player_store.add(state)
+
+        if song:
+            current_time = time.time()
+            elapsed_time = current_time - song.start_timestamp / 1000
+            playback_position = max(0, elapsed_time - song.onset)
+            player_element.sync_with_song(playback_position)
+
+        self.players[state.user_id] = player_element
+
+    def _remove_player(self, user_id):
+        player_element = self.players.pop(user_id)
+        self.player_store.remove(user_id)
+        self.spatial_grid.remove(user_id)
+        if len(self.player_pool) < MAX_POOLED_PLAYERS:
+            self.player_pool.append(player_element)
+
+    def _update_players(self):
+        players = self.game_state.players
+        if (
+            isinstance(players, PlayerRecords)
+            and players.generation == self.player_generation
+        ):
+            # The same players as in the last state, only their records changed.
+            records = players.records
+            self.player_store.update_rows(
+                self.player_rows,
+                records["position"],
+                records["status"],
+                records["mark"],
             )
+            return
 
-            if self.game_state.song:
-                current_time = time.time()
-                elapsed_time = current_time - self.game_state.song.start_timestamp / 1000
-                playback_position = max(0, elapsed_time - self.game_state.song.onset)
-                player_element.sync_with_song(playback_position)
+        present = set()
+        for state in players:
+            present.add(state.user_id)
+            player_element = self.players.get(state.user_id)
+            if player_element:
+                player_element.update_state(state)
+            else:
+                self._add_player(state)
 
-            return player_element
+        for user_id in self.players.keys() - present:
+            self._remove_player(user_id)
+
+        self.player_generation = None
+        if isinstance(players, PlayerRecords):
+            self.player_generation = players.generation
+            self.player_rows = np.array(
+                [self.player_store.rows[state.user_id] for state in players.identities],
+                dtype=np.intp,
+            )
+
+    def _get_visible_players(self):
+        """Returns the players in the viewport, from the back to the front."""
+        left, top, right, bottom = self.viewport.visible_bounds(CULLING_MARGIN)
+        # Grid cells hold store positions, see coordinates_to_local().
+        offset = PLAYER_RADIUS * 2
+        user_ids = list(
+            self.spatial_grid.query(
+                left - offset, top - offset, right - offset, bottom - offset
+            )
+        )
+        self.visible_players = len(user_ids)
+        # Players lower on the floor are drawn over the ones above them.
+        rows = [self.player_store.rows[user_id] for user_id in user_ids]
+        order = np.argsort(self.player_store.position[rows, 1], kind="stable")
+        return [user_ids[i] for i in order.tolist()]
 
     def draw(self, surface):
-        surface.fill(MANTLE)
+        """Returns the rectangles to update in dirty-rect mode, None otherwise."""
+        if self.dirty_rects:
+            self.dirty_rects.begin(surface)
+        else:
+            surface.fill(MANTLE)
+        rects = []
+
+        if self.render_list:
+            floor = self.render_list.layer(FLOOR_LAYER)
+            players = self.render_list.layer(PLAYER_LAYER)
+            hud = self.render_list.layer(HUD_LAYER)
+        else:
+            floor = players = hud = surface
 
         is_dancing = self._get_is_dancing()
 
         if self.game_state:
-            self.movement_indicator.draw(surface)
+            if self.blend_alpha is None:
+                self.player_store.interpolate(INTERPOLATION_SPEED)
+            else:
+                self.player_store.blend(self.blend_alpha)
+            self.spatial_grid.sync(self.player_store)
+
+            if self.followed_user_id in self.players:
+                self.viewport.center_on(
+                    *coordinates_to_local(
+                        self.player_store.get_position(self.followed_user_id)
+                    )
+                )
+            else:
+                self.followed_user_id = None
 
-            new_player_elements = []
-            for player in self.game_state.players:
-                player_element = self._update_player(player)
-                new_player_elements.append(player_element)
-            self.player_elements = new_player_elements
+            rects.append(self.movement_indicator.draw(floor, self.viewport))
 
-            for player_element in self.player_elements:
-                player_element.draw(surface)
+            for user_id in self._get_visible_players():
+                rects.append(self.players[user_id].draw(players, self.viewport))
 
-            self.dance_button.draw(surface, is_dancing)
+            rects.append(self.dance_button.draw(hud, is_dancing))
 
-            draw_location_name(surface, self.game_state.location_title)
+            rects.append(draw_location_name(hud, self.game_state.location_title))
             if self.game_state.song:
-                draw_song_name(surface, self.game_state.song.title)
+                rects.append(draw_song_name(hud, self.game_state.song.title))
 
             if self.game_state.scores:
-                display_leaderboard(surface, self.game_state.scores)
+                rects.append(display_leaderboard(hud, self.game_state.scores))
+
+            rects.append(draw_latency(hud, get_link_stats()["rtt_ms"]))
 
         if is_dancing:
             if self.bpm_bar:
                 self.bpm_bar.update()
-                self.bpm_bar.draw(surface)
+                rects.append(self.bpm_bar.draw(hud))
 
             if self.arrow_display:
-                self.arrow_display.draw(surface)
-
-            self.mark_display.draw(surface)
-
-        pygame.display.flip()
+                rects.append(self.arrow_display.draw(hud))
+
+            rects.append(self.mark_display.draw(hud))
+
+        if self.render_list:
+            self.render_list.submit(surface)
+
+        if self.show_stats:
+            stats = get_stats()
+            stats["mailbox"] = self.state_mailbox.get_stats()
+            if self.jitter_buffer:
+                stats["jitter_buffer"] = self.jitter_buffer.get_stats()
+            stats["text_cache"] = text_cache.get_stats()
+            stats["assets"] = assets.get_stats()
+            stats["player_sprites"] = player_sprites.get_stats()
+            stats["spatial_grid"] = {
+                **self.spatial_grid.get_stats(),
+                "visible": self.visible_players,
+            }
+            if self.render_list:
+                stats["render_list"] = self.render_list.get_stats()
+            rects.append(draw_stats_overlay(surface, stats))
+
+        if self.dirty_rects:
+            return self.dirty_rects.end(rects)
+        return None
 
 
 # TODO: display the login screen if there are no credentials
@@ -661,8 +1071,10 @@ class ScreenManager:
             self.current_screen.update()
 
     def draw(self, surface):
+        """Returns the rectangles of the display to update, or None for all."""
         if self.current_screen:
-            self.current_screen.draw(surface)
+            return self.current_screen.draw(surface)
+        return None
 
     def set_credentials(self, response):
         self.user_id = response["userId"]
@@ -0,0 +1,78 @@
+import math
+
+# Side of a grid cell in floor pixels, about the size of a player sprite.
+GRID_CELL_SIZE = 128
+
+
+class SpatialGrid:
+    """Uniform grid of the players on the floor.
+
+    Each player is filed under the cell their position falls in, so finding
+    the players in an area only looks at the cells it overlaps, and finding
+    the player at a point only at the cells around it.
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.user_cells = {}
+
+    def move(self, user_id, cell):
+        previous = self.user_cells.get(user_id)
+        if previous == cell:
+            return
+        if previous is not None:
+            self._discard(user_id, previous)
+        self.user_cells[user_id] = cell
+        self.cells.setdefault(cell, set()).add(user_id)
+
+    def remove(self, user_id):
+        cell = self.user_cells.pop(user_id, None)
+        if cell is not None:
+            self._discard(user_id, cell)
+
+    def _discard(self, user_id, cell):
+        users = self.cells[cell]
+        users.discard(user_id)
+        if not users:
+            del self.cells[cell]
+
+    def sync(self, store):
+        """Refiles the players of a PlayerStore who moved to another cell."""
+        rows, cells = store.changed_cells(self.cell_size)
+        for row, cell in zip(rows.tolist(), cells.tolist()):
+            self.move(store.user_ids[row], tuple(cell))
+
+    def clear(self):
+        self.cells.clear()
+        self.user_cells.clear()
+
+    def query(self, left, top, right, bottom):
+        """Yields the players in every cell overlapping the area."""
+        first_column = math.floor(left / self.cell_size)
+        last_column = math.floor(right / self.cell_size)
+        first_row = math.floor(top / self.cell_size)
+        last_row = math.floor(bottom / self.cell_size)
+        area = (last_column - first_column + 1) * (last_row - first_row + 1)
+        if area > len(self.cells):
+            # Zoomed far out: walking the occupied cells is cheaper.
+            for (column, row), users in self.cells.items():
+                if first_column <= column <= last_column and (
+                    first_row <= row <= last_row
+                ):
+                    yield from users
+            return
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                yield from self.cells.get((column, row), ())
+
+    def near(self, x, y):
+        """Yields the players in the cell of (x, y) and the cells around it."""
+        column = math.floor(x / self.cell_size)
+        row = math.floor(y / self.cell_size)
+        for cell_column in (column - 1, column, column + 1):
+            for cell_row in (row - 1, row, row + 1):
+                yield from self.cells.get((cell_column, cell_row), ())
+
+    def get_stats(self):
+        return {"cells": len(self.cells), "players": len(self.user_cells)}
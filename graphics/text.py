@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+TEXT_CACHE_ENTRIES = 1024
+TEXT_CACHE_BYTES = 16 * 1024 * 1024
+
+
+class TextCache:
+    """Least-recently-used cache of rendered text surfaces.
+
+    Entries are keyed by (font, text, color, antialias) and bounded both in
+    number and in the pixel memory they hold. Cached surfaces are shared
+    between callers, so they must only ever be blitted, never drawn on.
+    """
+
+    def __init__(self, max_entries=TEXT_CACHE_ENTRIES, max_bytes=TEXT_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._surfaces = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color):
+        """Same as font.render(text, antialias, color), rendered at most once."""
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        self.bytes += _surface_bytes(surface)
+        while len(self._surfaces) > self.max_entries or (
+            self.bytes > self.max_bytes and len(self._surfaces) > 1
+        ):
+            _, evicted = self._surfaces.popitem(last=False)
+            self.bytes -= _surface_bytes(evicted)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+    def get_stats(self):
+        return {
+            "entries": len(self._surfaces),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+text_cache = TextCache()
+
+
+def render_text(font, text, antialias, color):
+    return text_cache.render(font, text, antialias, color)
@@ -0,0 +1,68 @@
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT
+
+# Every zoom is a whole power of this step, so scaled sprites can be cached.
+ZOOM_STEP = 1.25
+MIN_ZOOM_LEVEL = -6
+MAX_ZOOM_LEVEL = 3
+
+
+class Viewport:
+    """Maps floor coordinates to the screen, scrolled and zoomed.
+
+    (x, y) is the floor point shown at the top left of the screen. The
+    default viewport shows the floor one to one, as it was drawn before the
+    floor could be larger than the window.
+    """
+
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.width = width
+        self.height = height
+        self.x = 0.0
+        self.y = 0.0
+        self.zoom_level = 0
+        self.zoom = 1.0
+
+    def to_screen(self, x, y):
+        return (
+            int((x - self.x) * self.zoom),
+            int((y - self.y) * self.zoom),
+        )
+
+    def to_floor(self, x, y):
+        return x / self.zoom + self.x, y / self.zoom + self.y
+
+    def pan(self, dx, dy):
+        """Scrolls the floor by (dx, dy) screen pixels."""
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+
+    def zoom_by(self, steps, anchor=None):
+        """Zooms in (or out, for negative steps) keeping `anchor` in place."""
+        level = max(MIN_ZOOM_LEVEL, min(MAX_ZOOM_LEVEL, self.zoom_level + steps))
+        if level == self.zoom_level:
+            return
+        if anchor is None:
+            anchor = (self.width / 2, self.height / 2)
+        floor_x, floor_y = self.to_floor(*anchor)
+        self.zoom_level = level
+        self.zoom = ZOOM_STEP**level
+        self.x = floor_x - anchor[0] / self.zoom
+        self.y = floor_y - anchor[1] / self.zoom
+
+    def center_on(self, x, y):
+        self.x = x - self.width / 2 / self.zoom
+        self.y = y - self.height / 2 / self.zoom
+
+    def reset(self):
+        self.x = self.y = 0.0
+        self.zoom_level = 0
+        self.zoom = 1.0
+
+    def visible_bounds(self, margin=0):
+        """Returns the (left, top, right, bottom) floor area on the screen."""
+        return (
+            self.x - margin,
+            self.y - margin,
+            self.x + self.width / self.zoom + margin,
+            self.y + self.height / self.zoom + margin,
+        )
@@ -0,0 +1,416 @@
+import argparse
+import asyncio
+import hmac
+import json
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT, DEFAULT_BLOB_COLOR
+from models import GameState, PlayerState, SongState
+from network import codec, compression, fragments
+from network.delta import SNAPSHOT_HISTORY
+from network.signing import jsonify
+from network.udp import calculate_hmac
+
+COLORS = [color for color in codec.COLORS if color]
+MARKS = [mark for mark in codec.MARKS if mark]
+ARROW_COUNT = 4
+KEYFRAME_INTERVAL = 50
+CLIENT_TIMEOUT = 10
+STATS_INTERVAL = 5
+
+# user id -> token, shared between the HTTP and UDP servers
+tokens = {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Twirl server stand-in")
+    parser.add_argument("--players", type=int, default=10, help="Simulated players")
+    parser.add_argument("--bpm", type=int, default=120, help="Song tempo")
+    parser.add_argument("--rate", type=float, default=20, help="State broadcasts/s")
+    parser.add_argument(
+        "--floor",
+        type=int,
+        nargs=2,
+        default=[SCREEN_WIDTH, SCREEN_HEIGHT],
+        metavar=("WIDTH", "HEIGHT"),
+        help="Size of the dance floor, which may be larger than the window",
+    )
+    parser.add_argument("--http-port", type=int, default=8080)
+    parser.add_argument("--udp-port", type=int, default=9000)
+    parser.add_argument("--mtu", type=int, default=1500)
+    parser.add_argument("--binary", action="store_true", help="Offer binary states")
+    parser.add_argument("--deltas", action="store_true", help="Send delta states")
+    parser.add_argument(
+        "--jitter", type=float, default=0, help="Random extra delay up to N ms"
+    )
+    parser.add_argument(
+        "--compress", action="store_true", help="Compress datagrams when offered"
+    )
+    parser.add_argument(
+        "--dictionary", type=str, help="Custom compression dictionary file"
+    )
+    return parser.parse_args()
+
+
+class LoginHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/login":
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            username = payload["username"]
+            payload["password"]
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        user_id = f"local-{username}"
+        tokens[user_id] = secrets.token_hex(16)
+        body = json.dumps({"userId": user_id, "token": tokens[user_id]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Simulation:
+    """N players wandering around the floor and dancing to one song."""
+
+    def __init__(self, player_count, bpm, floor=(SCREEN_WIDTH, SCREEN_HEIGHT)):
+        self.floor_width, self.floor_height = floor
+        self.song = SongState(
+            id="local",
+            title=f"Local song ({bpm} bpm)",
+            bpm=bpm,
+            onset=0,
+            startTimestamp=int(time.time() * 1000),
+        )
+        self.players = {}
+        for i in range(player_count):
+            self.add_player(f"bot-{i}", f"bot{i}")
+            self.players[f"bot-{i}"].color = random.choice(COLORS)
+        self.scores = {}
+        self.arrow_combination = self._new_combination()
+        self.last_pass = 0
+
+    def add_player(self, user_id, username):
+        self.players[user_id] = PlayerState(
+            userId=user_id,
+            username=username,
+            latitude=random.uniform(0, self.floor_height - 100),
+            longitude=random.uniform(0, self.floor_width - 100),
+            isMain=False,
+            status="idle",
+            color=DEFAULT_BLOB_COLOR,
+        )
+
+    @staticmethod
+    def _new_combination():
+        return [str(random.randint(-3, 3)) for _ in range(ARROW_COUNT)]
+
+    def step(self, simulated):
+        for user_id in simulated:
+            player = self.players[user_id]
+            if random.random() < 0.02:
+                player.latitude = random.uniform(0, self.floor_height - 100)
+                player.longitude = random.uniform(0, self.floor_width - 100)
+            if random.random() < 0.005:
+                player.status = "dancing" if player.status == "idle" else "idle"
+
+        pass_duration = 8 * 60 / self.song.bpm
+        elapsed = time.time() - self.song.start_timestamp / 1000
+        current_pass = int(elapsed / pass_duration)
+        if current_pass != self.last_pass:
+            self.last_pass = current_pass
+            self.arrow_combination = self._new_combination()
+            for user_id in simulated:
+                player = self.players[user_id]
+                if player.status != "dancing":
+                    continue
+                player.last_mark = random.choice(MARKS)
+                if player.last_mark in ("perfect", "good"):
+                    score = self.scores.get(player.username, 0)
+                    self.scores[player.username] = score + 1
+
+    def game_state(self, main_user_id):
+        players = [
+            (
+                player.model_copy(update={"is_main": True})
+                if user_id == main_user_id
+                else player
+            )
+            for user_id, player in self.players.items()
+        ]
+        return GameState(
+            players=players,
+            song=self.song,
+            locationTitle="Local floor",
+            arrowCombination=self.arrow_combination,
+            scores=dict(sorted(self.scores.items(), key=lambda x: -x[1])[:10]),
+        )
+
+
+class Client:
+    def __init__(self, user_id, address):
+        self.user_id = user_id
+        self.address = address
+        self.binary = False
+        self.dictionary = None
+        self.echo = None
+        self.last_seen = time.monotonic()
+        self.player_table = codec.PlayerTable()
+        # Player keys of the last states sent, by snapshot id, to base
+        # deltas on the latest one the client acknowledged.
+        self.sent_snapshots = OrderedDict()
+        self.acked_snapshot = None
+        self.snapshot_id = 0
+        self.keyframe_requested = True
+
+
+class ServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def connection_made(self, transport):
+        self.server.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.server.handle_event(data, addr)
+
+
+class LocalServer:
+    def __init__(self, args):
+        self.args = args
+        self.simulation = Simulation(args.players, args.bpm, args.floor)
+        self.simulated = list(self.simulation.players)
+        self.clients = {}
+        self.transport = None
+        self.datagram_size = fragments.max_datagram_size(args.mtu)
+        self.compressor = compression.Compressor()
+        if args.dictionary:
+            self.compressor.add_dictionary(
+                compression.CUSTOM_DICTIONARY,
+                compression.load_dictionary(args.dictionary),
+            )
+        self.next_fragment_id = 0
+        self.received = 0
+        self.rejected = 0
+        self.sent = 0
+        self.sent_bytes = 0
+
+    def handle_event(self, data, addr):
+        self.received += 1
+        try:
+            if compression.is_compressed(data):
+                data, _ = self.compressor.decompress(data)
+            if codec.is_binary(data):
+                user_id, event, contents, digest, message = codec.decode_event(data)
+                token = tokens.get(user_id)
+                expected = token and hmac.new(
+                    token.encode("utf-8"), contents, "sha256"
+                ).digest()
+                contents = codec.decode_event_contents(event, contents)
+            else:
+                message = json.loads(data)
+                user_id = message["userId"]
+                event = message["event"]
+                contents = message["contents"]
+                token = tokens.get(user_id)
+                digest = message["hmac"]
+                expected = token and calculate_hmac(jsonify(contents), token)
+        except (
+            ValueError,
+            KeyError,
+            TypeError,
+            codec.CodecError,
+            compression.CompressionError,
+        ):
+            self.rejected += 1
+            return
+        if not token or not hmac.compare_digest(expected, digest):
+            self.rejected += 1
+            return
+
+        client = self.clients.get(user_id)
+        if client is None:
+            client = self.clients[user_id] = Client(user_id, addr)
+            self.simulation.add_player(user_id, user_id.removeprefix("local-"))
+        client.address = addr
+        client.last_seen = time.monotonic()
+        player = self.simulation.players[user_id]
+
+        # Every message carries the link fields, outside its signed contents.
+        if "seq" in message:
+            client.echo = message["seq"]
+            ack = message.get("ack")
+            if ack is None:
+                # A client that acknowledged nothing knows no identities yet.
+                client.player_table.forget_acknowledgements()
+            else:
+                client.player_table.acknowledge(ack)
+            client.acked_snapshot = ack
+            if message.get("resync"):
+                client.keyframe_requested = True
+
+        if event == "hello":
+            client.binary = self.args.binary and "binary" in message.get("formats", [])
+            if self.args.compress:
+                client.dictionary = next(
+                    (
+                        dictionary_id
+                        for dictionary_id in message.get("compression", [])
+                        if dictionary_id in self.compressor.dictionaries
+                    ),
+                    None,
+                )
+        elif event == "move":
+            player.latitude = contents["latitude"]
+            player.longitude = contents["longitude"]
+        elif event == "status":
+            player.status = contents
+        elif event == "mark":
+            player.last_mark = contents
+
+    async def broadcast(self):
+        interval = 1 / self.args.rate
+        while True:
+            started_at = time.monotonic()
+            self.simulation.step(self.simulated)
+            for user_id, client in list(self.clients.items()):
+                if started_at - client.last_seen > CLIENT_TIMEOUT:
+                    del self.clients[user_id]
+                    del self.simulation.players[user_id]
+                    continue
+                self._send_state(client)
+            await asyncio.sleep(max(0, interval - (time.monotonic() - started_at)))
+
+    def _send_state(self, client):
+        game_state = self.simulation.game_state(client.user_id)
+        game_state.echo = client.echo
+        client.snapshot_id += 1
+        game_state.sequence = client.snapshot_id
+        game_state.server_time = int(time.time() * 1000)
+        if client.binary:
+            payload = codec.encode_game_state(game_state, client.player_table)
+        elif self.args.deltas:
+            payload = self._encode_delta(client, game_state)
+        else:
+            payload = game_state.model_dump_json(by_alias=True).encode()
+        if client.dictionary is not None:
+            payload = self.compressor.compress(payload, client.dictionary)
+
+        if len(payload) > self.datagram_size:
+            self.next_fragment_id += 1
+            datagrams = fragments.split(
+                payload, self.next_fragment_id, self.datagram_size
+            )
+        else:
+            datagrams = [payload]
+        delay = random.uniform(0, self.args.jitter) / 1000
+        for datagram in datagrams:
+            if delay:
+                asyncio.get_running_loop().call_later(
+                    delay, self.transport.sendto, datagram, client.address
+                )
+            else:
+                self.transport.sendto(datagram, client.address)
+            self.sent += 1
+            self.sent_bytes += len(datagram)
+
+    @staticmethod
+    def _encode_delta(client, game_state):
+        players = {player.user_id: player for player in game_state.players}
+        # The snapshot id and the base id go first, clients peek at them
+        # without decoding.
+        delta = {"snapshotId": client.snapshot_id}
+
+        base = client.sent_snapshots.get(client.acked_snapshot)
+        if (
+            client.keyframe_requested
+            or base is None
+            or client.snapshot_id % KEYFRAME_INTERVAL == 0
+        ):
+            changed = list(players.values())
+            delta["removed"] = []
+            client.keyframe_requested = False
+        else:
+            delta["baseId"] = client.acked_snapshot
+            changed = [
+                player
+                for user_id, player in players.items()
+                if base.get(user_id) != _player_key(player)
+            ]
+            delta["removed"] = [user_id for user_id in base if user_id not in players]
+        delta.update(
+            game_state.model_dump(by_alias=True, exclude={"players", "sequence"})
+        )
+        delta["players"] = [player.model_dump(by_alias=True) for player in changed]
+        client.sent_snapshots[client.snapshot_id] = {
+            user_id: _player_key(player) for user_id, player in players.items()
+        }
+        # The client only keeps this many snapshots to base deltas on.
+        while len(client.sent_snapshots) > SNAPSHOT_HISTORY:
+            client.sent_snapshots.popitem(last=False)
+        return json.dumps(delta).encode()
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            print(
+                f"{len(self.clients)} clients, {self.received} events in "
+                f"({self.rejected} rejected), {self.sent} datagrams "
+                f"({self.sent_bytes} bytes) out"
+            )
+
+
+def _player_key(player):
+    return (
+        player.latitude,
+        player.longitude,
+        player.status,
+        player.last_mark,
+        player.color,
+        player.is_main,
+    )
+
+
+async def serve(args):
+    server = LocalServer(args)
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(
+        lambda: ServerProtocol(server), local_addr=("127.0.0.1", args.udp_port)
+    )
+    loop.create_task(server.report())
+    await server.broadcast()
+
+
+def main():
+    args = parse_args()
+
+    http_server = ThreadingHTTPServer(("127.0.0.1", args.http_port), LoginHandler)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+
+    print(f"AUTH_URL=http://127.0.0.1:{args.http_port}")
+    print("UDP_ADDRESS=127.0.0.1")
+    print(f"UDP_PORT={args.udp_port}")
+    print(f"Simulating {args.players} players at {args.bpm} bpm")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,14 @@ import sys
 from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT
 from graphics.screens import ScreenManager, LoginScreen
 
-pygame.init()
-
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Twirl")
-
 
 def main():
+    # Set up here rather than on import: the offload worker is started with
+    # the spawn method, which imports this module again in the new process.
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Twirl")
+
     clock = pygame.time.Clock()
     screen_manager = ScreenManager()
     screen_manager.set_screen(LoginScreen(screen_manager))
@@ -24,9 +25,12 @@ def main():
             screen_manager.handle_event(event)
 
         screen_manager.update()
-        screen_manager.draw(screen)
+        dirty_rects = screen_manager.draw(screen)
 
-        pygame.display.flip()
+        if dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
         clock.tick(30)
 
     pygame.quit()
@@ -24,6 +24,8 @@ class PlayerState(BaseModel):
 
 
 class GameState(BaseModel):
+    # Serialized first, so clients can drop stale states without decoding.
+    sequence: Optional[int] = None
     players: List[PlayerState]
     song: Optional[SongState] = None
     location_title: str = Field(..., alias="locationTitle")
@@ -31,3 +33,20 @@ class GameState(BaseModel):
         default=None, alias="arrowCombination"
     )
     scores: Optional[Dict[str, int]] = None
+    echo: Optional[int] = None
+    server_time: Optional[int] = Field(default=None, alias="serverTime")
+
+
+class GameStateDelta(BaseModel):
+    snapshot_id: int = Field(..., alias="snapshotId")
+    base_id: Optional[int] = Field(default=None, alias="baseId")
+    players: List[PlayerState] = []
+    removed: List[str] = []
+    song: Optional[SongState] = None
+    location_title: str = Field(..., alias="locationTitle")
+    arrow_combination: Optional[List[str]] = Field(
+        default=None, alias="arrowCombination"
+    )
+    scores: Optional[Dict[str, int]] = None
+    echo: Optional[int] = None
+    server_time: Optional[int] = Field(default=None, alias="serverTime")
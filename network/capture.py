@@ -0,0 +1,50 @@
+import os
+import struct
+import time
+
+FILE_MAGIC = b"TWIRLCAP"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct("<8sB")
+RECORD_HEADER = struct.Struct("<QI")  # monotonic timestamp (ns), datagram size
+
+
+class CaptureWriter:
+    """Appends received datagrams with their monotonic arrival time to a file."""
+
+    def __init__(self, path):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if is_new:
+            self.file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION))
+        self.records = 0
+
+    def write(self, data, timestamp_ns=None):
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        self.file.write(RECORD_HEADER.pack(timestamp_ns, len(data)))
+        self.file.write(data)
+        self.records += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_capture(path):
+    """Yields (timestamp in seconds, datagram) for every captured record."""
+    with open(path, "rb") as capture_file:
+        header = capture_file.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise ValueError(f"{path} is not a capture file")
+        magic, version = FILE_HEADER.unpack(header)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f"{path} is not a version {FILE_VERSION} capture file")
+
+        while True:
+            record_header = capture_file.read(RECORD_HEADER.size)
+            if len(record_header) < RECORD_HEADER.size:
+                return
+            timestamp_ns, size = RECORD_HEADER.unpack(record_header)
+            data = capture_file.read(size)
+            if len(data) < size:
+                return
+            yield timestamp_ns / 1e9, data
@@ -0,0 +1,462 @@
+import struct
+from collections import OrderedDict
+
+from typing import List
+
+from pydantic import TypeAdapter
+
+from models import GameState, PlayerState, SongState
+
+# Binary datagrams start with MAGIC; JSON datagrams always start with "{".
+MAGIC = 0xB7
+VERSION = 1
+
+BINARY_FORMAT = "binary"
+JSON_FORMAT = "json"
+
+MESSAGE_STATE = 1
+MESSAGE_EVENT = 2
+
+HEADER = struct.Struct("<BBB")  # magic, version, message type
+STATE_HEADER = struct.Struct("<BH")  # flags, player count
+SONG = struct.Struct("<HfQ")  # bpm, onset, start timestamp (ms)
+PLAYER = struct.Struct("<HBffBBB")  # index, flags, lat, long, status, mark, color
+SCORE = struct.Struct("<i")
+ECHO = struct.Struct("<I")
+SEQUENCE = struct.Struct("<IQ")  # sequence, server time (ms, 0 if unknown)
+MOVE = struct.Struct("<ff")  # latitude, longitude
+LINK = struct.Struct("<BII")  # flags, RTT probe sequence, acknowledged sequence
+U8 = struct.Struct("<B")
+U16 = struct.Struct("<H")
+I8 = struct.Struct("<b")
+
+HMAC_SIZE = 32
+
+STATE_HAS_SONG = 0x01
+STATE_HAS_ARROWS = 0x02
+STATE_HAS_SCORES = 0x04
+STATE_HAS_ECHO = 0x08
+STATE_HAS_SEQUENCE = 0x10
+
+PLAYER_IS_MAIN = 0x01
+PLAYER_HAS_IDENTITY = 0x02
+
+LINK_HAS_SEQ = 0x01
+LINK_HAS_ACK = 0x02
+LINK_RESYNC = 0x04
+
+# Code 0 is reserved for "not set" in every table below.
+STATUSES = [None, "idle", "dancing"]
+MARKS = [None, "perfect", "good", "bad", "miss"]
+COLORS = [None, "white", "green", "lavender", "maroon", "yellow", "gradient"]
+EVENTS = [None, "hello", "move", "status", "mark"]
+
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+MARK_CODES = {mark: code for code, mark in enumerate(MARKS)}
+COLOR_CODES = {color: code for code, color in enumerate(COLORS)}
+EVENT_CODES = {event: code for code, event in enumerate(EVENTS)}
+
+
+PLAYER_LIST = TypeAdapter(List[PlayerState])
+
+
+class CodecError(Exception):
+    pass
+
+
+class TruncatedError(CodecError):
+    pass
+
+
+# Unacknowledged states whose announcements are remembered by the encoder.
+ANNOUNCEMENT_HISTORY = 64
+
+
+class PlayerTable:
+    """Per-session mapping between compact player indices and user ids.
+
+    A player's user id and username are sent along with its index in every
+    state until the client acknowledges a state that carried them; later
+    records carry the index alone. A lost or late announcement is therefore
+    repeated until one gets through.
+    """
+
+    def __init__(self):
+        self.identities = {}
+        self.indices = {}
+        # Encoder side: indices the client is known to have the identity of,
+        # and the indices announced by each recent sequenced state.
+        self.acknowledged = set()
+        self.announcements = OrderedDict()
+        # Decoder side: sequence of the newest state decoded, to acknowledge.
+        self.latest_sequence = None
+
+    def index_of(self, user_id):
+        index = self.indices.get(user_id)
+        if index is None:
+            index = len(self.indices)
+            if index > 0xFFFF:
+                raise CodecError("Player table is full")
+            self.indices[user_id] = index
+        return index
+
+    def set_identity(self, index, user_id, username):
+        self.identities[index] = (user_id, username)
+
+    def get_identity(self, index):
+        identity = self.identities.get(index)
+        if identity is None:
+            raise CodecError(f"Unknown player index {index}")
+        return identity
+
+    def on_announced(self, sequence, indices):
+        if sequence is None:
+            # Unsequenced states cannot be acknowledged.
+            self.acknowledged.update(indices)
+            return
+        self.announcements[sequence] = indices
+        while len(self.announcements) > ANNOUNCEMENT_HISTORY:
+            self.announcements.popitem(last=False)
+
+    def acknowledge(self, sequence):
+        """Records that the client decoded the state numbered `sequence`."""
+        self.acknowledged.update(self.announcements.pop(sequence, ()))
+        # Older states are not going to be acknowledged anymore.
+        for announced_sequence in list(self.announcements):
+            if announced_sequence < sequence:
+                del self.announcements[announced_sequence]
+
+    def forget_acknowledgements(self):
+        """Announces every identity again, e.g. to a restarted client."""
+        self.acknowledged.clear()
+        self.announcements.clear()
+
+
+def _code(codes, value, kind):
+    try:
+        return codes[value]
+    except KeyError:
+        raise CodecError(f"Unknown {kind} {value!r}")
+
+
+def _value(values, code, kind):
+    if code >= len(values):
+        raise CodecError(f"Unknown {kind} code {code}")
+    return values[code]
+
+
+def _pack_str(parts, value, length=U8):
+    encoded = value.encode("utf-8")
+    if len(encoded) >= 1 << (8 * length.size):
+        raise CodecError(f"String too long: {value[:20]!r}...")
+    parts.append(length.pack(len(encoded)))
+    parts.append(encoded)
+
+
+def _unpack_str(data, offset, length=U8):
+    (size,) = length.unpack_from(data, offset)
+    offset += length.size
+    end = offset + size
+    if end > len(data):
+        raise TruncatedError("Truncated string")
+    return bytes(data[offset:end]).decode("utf-8"), end
+
+
+def is_binary(data):
+    return len(data) > 0 and data[0] == MAGIC
+
+
+def encode_game_state(game_state: GameState, table: PlayerTable, announce_all=False):
+    flags = 0
+    if game_state.song:
+        flags |= STATE_HAS_SONG
+    if game_state.arrow_combination is not None:
+        flags |= STATE_HAS_ARROWS
+    if game_state.scores is not None:
+        flags |= STATE_HAS_SCORES
+    if game_state.echo is not None:
+        flags |= STATE_HAS_ECHO
+    if game_state.sequence is not None:
+        flags |= STATE_HAS_SEQUENCE
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, MESSAGE_STATE),
+        STATE_HEADER.pack(flags, len(game_state.players)),
+    ]
+    # Kept at a fixed offset so peek_sequence() can find it.
+    if game_state.sequence is not None:
+        parts.append(SEQUENCE.pack(game_state.sequence, game_state.server_time or 0))
+    _pack_str(parts, game_state.location_title, U16)
+    if game_state.echo is not None:
+        parts.append(ECHO.pack(game_state.echo))
+
+    song = game_state.song
+    if song:
+        _pack_str(parts, song.id)
+        _pack_str(parts, song.title, U16)
+        parts.append(SONG.pack(song.bpm, song.onset, song.start_timestamp))
+
+    announced = []
+    for player in game_state.players:
+        index = table.index_of(player.user_id)
+        player_flags = PLAYER_IS_MAIN if player.is_main else 0
+        if announce_all or index not in table.acknowledged:
+            player_flags |= PLAYER_HAS_IDENTITY
+            announced.append(index)
+        parts.append(
+            PLAYER.pack(
+                index,
+                player_flags,
+                player.latitude,
+                player.longitude,
+                _code(STATUS_CODES, player.status, "status"),
+                _code(MARK_CODES, player.last_mark, "mark"),
+                _code(COLOR_CODES, player.color, "color"),
+            )
+        )
+        if player_flags & PLAYER_HAS_IDENTITY:
+            _pack_str(parts, player.user_id)
+            _pack_str(parts, player.username)
+    if announced:
+        table.on_announced(game_state.sequence, announced)
+
+    if game_state.arrow_combination is not None:
+        parts.append(U8.pack(len(game_state.arrow_combination)))
+        parts.extend(I8.pack(int(arrow)) for arrow in game_state.arrow_combination)
+
+    if game_state.scores is not None:
+        parts.append(U16.pack(len(game_state.scores)))
+        for username, score in game_state.scores.items():
+            _pack_str(parts, username)
+            parts.append(SCORE.pack(score))
+
+    return b"".join(parts)
+
+
+def decode_game_state(data, table: PlayerTable) -> GameState:
+    """Decodes a binary game state from any buffer, without copying it."""
+    try:
+        magic, version, message_type = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or message_type != MESSAGE_STATE:
+            raise CodecError("Not a binary game state")
+        offset = HEADER.size
+
+        flags, player_count = STATE_HEADER.unpack_from(data, offset)
+        offset += STATE_HEADER.size
+        sequence = server_time = None
+        if flags & STATE_HAS_SEQUENCE:
+            sequence, server_time = SEQUENCE.unpack_from(data, offset)
+            offset += SEQUENCE.size
+        location_title, offset = _unpack_str(data, offset, U16)
+        echo = None
+        if flags & STATE_HAS_ECHO:
+            (echo,) = ECHO.unpack_from(data, offset)
+            offset += ECHO.size
+
+        song = None
+        if flags & STATE_HAS_SONG:
+            song_id, offset = _unpack_str(data, offset)
+            title, offset = _unpack_str(data, offset, U16)
+            bpm, onset, start_timestamp = SONG.unpack_from(data, offset)
+            offset += SONG.size
+            song = SongState(
+                id=song_id,
+                title=title,
+                bpm=bpm,
+                onset=onset,
+                startTimestamp=start_timestamp,
+            )
+
+        players = []
+        identities = table.identities
+        size = len(data)
+        for _ in range(player_count):
+            index, player_flags, latitude, longitude, status, mark, color = (
+                PLAYER.unpack_from(data, offset)
+            )
+            offset += PLAYER.size
+            if player_flags & PLAYER_HAS_IDENTITY:
+                # _unpack_str inlined, this runs for every announced player.
+                end = offset + 1 + data[offset]
+                user_id = str(data[offset + 1 : end], "utf-8")
+                offset = end + 1 + data[end]
+                if offset > size:
+                    raise TruncatedError("Truncated player identity")
+                username = str(data[end + 1 : offset], "utf-8")
+                identities[index] = (user_id, username)
+            if index not in identities:
+                raise CodecError(f"Unknown player index {index}")
+            user_id, username = identities[index]
+            if status >= len(STATUSES) or mark >= len(MARKS) or color >= len(COLORS):
+                _value(STATUSES, status, "status")
+                _value(MARKS, mark, "mark")
+                _value(COLORS, color, "color")
+            players.append(
+                {
+                    "userId": user_id,
+                    "username": username,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "isMain": bool(player_flags & PLAYER_IS_MAIN),
+                    "status": STATUSES[status],
+                    "lastMark": MARKS[mark],
+                    "color": COLORS[color],
+                }
+            )
+
+        arrow_combination = None
+        if flags & STATE_HAS_ARROWS:
+            (count,) = U8.unpack_from(data, offset)
+            offset += U8.size
+            arrow_combination = [
+                str(I8.unpack_from(data, offset + i)[0]) for i in range(count)
+            ]
+            offset += count
+
+        scores = None
+        if flags & STATE_HAS_SCORES:
+            (count,) = U16.unpack_from(data, offset)
+            offset += U16.size
+            scores = {}
+            for _ in range(count):
+                username, offset = _unpack_str(data, offset)
+                (scores[username],) = SCORE.unpack_from(data, offset)
+                offset += SCORE.size
+    except (struct.error, IndexError) as e:
+        raise TruncatedError(f"Truncated binary game state: {e}")
+    except UnicodeDecodeError as e:
+        raise CodecError(f"Malformed binary game state: {e}")
+
+    if sequence is not None:
+        table.latest_sequence = sequence
+    return GameState(
+        # Validated in one batch rather than one model at a time.
+        players=PLAYER_LIST.validate_python(players),
+        song=song,
+        locationTitle=location_title,
+        arrowCombination=arrow_combination,
+        scores=scores,
+        echo=echo,
+        sequence=sequence,
+        serverTime=server_time or None,
+    )
+
+
+def peek_sequence(data):
+    """Returns the sequence number of a binary game state without decoding it."""
+    offset = HEADER.size + STATE_HEADER.size
+    if len(data) < offset + SEQUENCE.size:
+        return None
+    flags = data[HEADER.size]
+    if not flags & STATE_HAS_SEQUENCE:
+        return None
+    return SEQUENCE.unpack_from(data, offset)[0]
+
+
+def encode_move(latitude, longitude):
+    return MOVE.pack(latitude, longitude)
+
+
+def encode_status(status):
+    return U8.pack(_code(STATUS_CODES, status, "status"))
+
+
+def encode_mark(mark):
+    return U8.pack(_code(MARK_CODES, mark, "mark"))
+
+
+def encode_event_prefix(user_id, event):
+    parts = [HEADER.pack(MAGIC, VERSION, MESSAGE_EVENT)]
+    parts.append(U8.pack(_code(EVENT_CODES, event, "event")))
+    _pack_str(parts, str(user_id))
+    return b"".join(parts)
+
+
+def encode_event(user_id, event, contents: bytes, digest: bytes):
+    return encode_event_prefix(user_id, event) + contents + digest
+
+
+def encode_link(seq=None, ack=None, resync=False):
+    """Encodes the link fields appended to a binary event, after its digest.
+
+    They are the binary counterpart of the "seq", "ack" and "resync" fields
+    of JSON messages, and like them are not signed.
+    """
+    flags = 0
+    if seq is not None:
+        flags |= LINK_HAS_SEQ
+    if ack is not None:
+        flags |= LINK_HAS_ACK
+    if resync:
+        flags |= LINK_RESYNC
+    return LINK.pack(flags, (seq or 0) & 0xFFFFFFFF, (ack or 0) & 0xFFFFFFFF)
+
+
+def _decode_link(data, offset):
+    if offset == len(data):
+        return {}
+    try:
+        flags, seq, ack = LINK.unpack_from(data, offset)
+    except struct.error:
+        raise TruncatedError("Truncated link fields")
+    if offset + LINK.size != len(data):
+        raise CodecError("Trailing bytes after link fields")
+    link = {}
+    if flags & LINK_HAS_SEQ:
+        link["seq"] = seq
+    if flags & LINK_HAS_ACK:
+        link["ack"] = ack
+    if flags & LINK_RESYNC:
+        link["resync"] = True
+    return link
+
+
+def _contents_size(event, data, offset):
+    if event == "move":
+        return MOVE.size
+    if event in ("status", "mark"):
+        return U8.size
+    # A hello carries the location id as a string.
+    return U8.size + U8.unpack_from(data, offset)[0]
+
+
+def decode_event(data):
+    """Returns (user_id, event, contents bytes, digest, link fields) of a
+    binary event; the link fields are a dict with the keys JSON messages use.
+    """
+    try:
+        magic, version, message_type = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or message_type != MESSAGE_EVENT:
+            raise CodecError("Not a binary event")
+        offset = HEADER.size
+        (event,) = U8.unpack_from(data, offset)
+        offset += U8.size
+        user_id, offset = _unpack_str(data, offset)
+        event = _value(EVENTS, event, "event")
+        end = offset + _contents_size(event, data, offset)
+    except struct.error as e:
+        raise TruncatedError(f"Truncated binary event: {e}")
+    except UnicodeDecodeError as e:
+        raise CodecError(f"Malformed binary event: {e}")
+    if len(data) < end + HMAC_SIZE:
+        raise TruncatedError("Truncated binary event")
+    contents = bytes(data[offset:end])
+    digest = bytes(data[end : end + HMAC_SIZE])
+    link = _decode_link(data, end + HMAC_SIZE)
+    return user_id, event, contents, digest, link
+
+
+def decode_event_contents(event, contents: bytes):
+    try:
+        if event == "move":
+            latitude, longitude = MOVE.unpack(contents)
+            return {"latitude": latitude, "longitude": longitude}
+        if event == "status":
+            return _value(STATUSES, U8.unpack(contents)[0], "status")
+        if event == "mark":
+            return _value(MARKS, U8.unpack(contents)[0], "mark")
+        if event == "hello":
+            return _unpack_str(contents, 0)[0]
+    except struct.error as e:
+        raise CodecError(f"Malformed {event} contents: {e}")
+    raise CodecError(f"Unknown event {event!r}")
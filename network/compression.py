@@ -0,0 +1,117 @@
+import struct
+import zlib
+
+# Compressed datagrams start with MAGIC, followed by the id of the preset
+# dictionary they were compressed against. The rest is a raw deflate stream.
+MAGIC = 0xC7
+HEADER = struct.Struct("<BB")
+
+# The built-in dictionary is a committed file: peers can only share a
+# dictionary id if they agree on its bytes, so any change to the file needs
+# a new id (and file name). Custom dictionaries use an id clear of those.
+BUILTIN_DICTIONARY = 1
+BUILTIN_DICTIONARY_FILE = "./assets/dictionaries/builtin-1.zdict"
+CUSTOM_DICTIONARY = 255
+
+COMPRESSION_LEVEL = 6
+MAX_DICTIONARY_SIZE = 32 * 1024
+MAX_DECOMPRESSED_SIZE = 1 << 20
+
+
+class CompressionError(Exception):
+    pass
+
+
+def is_compressed(data):
+    return len(data) >= HEADER.size and data[0] == MAGIC
+
+
+def build_dictionary(payloads, size=MAX_DICTIONARY_SIZE):
+    """Builds a preset dictionary from recorded payloads.
+
+    Later payloads are placed closer to the end of the dictionary, where
+    they are cheapest to reference; repeated payloads are kept once.
+    """
+    parts = []
+    total = 0
+    for payload in reversed(list(dict.fromkeys(payloads))):
+        if total >= size:
+            break
+        parts.append(payload)
+        total += len(payload)
+    return b"".join(reversed(parts))[-size:]
+
+
+def load_dictionary(path):
+    with open(path, "rb") as dictionary_file:
+        return dictionary_file.read(MAX_DICTIONARY_SIZE)
+
+
+DICTIONARIES = {BUILTIN_DICTIONARY: load_dictionary(BUILTIN_DICTIONARY_FILE)}
+
+
+class Compressor:
+    """Compresses single datagrams against preset dictionaries.
+
+    Every datagram is compressed on its own so it can be decoded whatever
+    was lost before it. The zlib streams are primed with each dictionary
+    once and copied per datagram.
+    """
+
+    def __init__(self, dictionaries=None, level=COMPRESSION_LEVEL):
+        self.dictionaries = dict(DICTIONARIES if dictionaries is None else dictionaries)
+        self.level = level
+        self._compressors = {}
+        self._decompressors = {}
+
+    def add_dictionary(self, dictionary_id, dictionary):
+        self.dictionaries[dictionary_id] = dictionary
+        self._compressors.pop(dictionary_id, None)
+        self._decompressors.pop(dictionary_id, None)
+
+    def _dictionary(self, dictionary_id):
+        dictionary = self.dictionaries.get(dictionary_id)
+        if dictionary is None:
+            raise CompressionError(f"Unknown dictionary {dictionary_id}")
+        return dictionary
+
+    def compress(self, payload, dictionary_id=BUILTIN_DICTIONARY):
+        compressor = self._compressors.get(dictionary_id)
+        if compressor is None:
+            compressor = self._compressors[dictionary_id] = zlib.compressobj(
+                self.level,
+                zlib.DEFLATED,
+                -zlib.MAX_WBITS,
+                zdict=self._dictionary(dictionary_id),
+            )
+        compressor = compressor.copy()
+        return b"".join(
+            (
+                HEADER.pack(MAGIC, dictionary_id),
+                compressor.compress(payload),
+                compressor.flush(),
+            )
+        )
+
+    def decompress(self, data):
+        """Returns the payload and the id of the dictionary it was packed with."""
+        if not is_compressed(data):
+            raise CompressionError("Not a compressed datagram")
+        _, dictionary_id = HEADER.unpack_from(data, 0)
+        decompressor = self._decompressors.get(dictionary_id)
+        if decompressor is None:
+            decompressor = self._decompressors[dictionary_id] = zlib.decompressobj(
+                -zlib.MAX_WBITS, zdict=self._dictionary(dictionary_id)
+            )
+        decompressor = decompressor.copy()
+        try:
+            payload = decompressor.decompress(
+                memoryview(data)[HEADER.size :], MAX_DECOMPRESSED_SIZE
+            )
+        except zlib.error as e:
+            raise CompressionError(f"Malformed compressed datagram: {e}")
+        if decompressor.unconsumed_tail:
+            raise CompressionError("Compressed datagram is too large")
+        if not decompressor.eof:
+            raise CompressionError("Truncated compressed datagram")
+        return payload, dictionary_id
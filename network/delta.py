@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+from models import GameState, GameStateDelta
+
+SNAPSHOT_HISTORY = 32
+
+
+class SnapshotTable:
+    """Rebuilds full game states from delta snapshots.
+
+    Every applied snapshot keeps its player table (indexed by user id) so
+    later deltas may be based on any of the last SNAPSHOT_HISTORY snapshots.
+    A delta without a base id is a keyframe and replaces the table; one
+    older than the latest snapshot comes from a restarted server and starts
+    the snapshot ids over.
+    """
+
+    def __init__(self, history=SNAPSHOT_HISTORY):
+        self.history = history
+        self.snapshots = OrderedDict()
+        self.latest_id = None
+        self.resync_requested = False
+        self.applied = 0
+        self.stale = 0
+        self.missing_base = 0
+        self.resets = 0
+
+    def apply(self, delta: GameStateDelta) -> GameState | None:
+        if self.latest_id is not None and delta.snapshot_id <= self.latest_id:
+            if delta.base_id is not None or delta.snapshot_id == self.latest_id:
+                self.stale += 1
+                return None
+            self.snapshots.clear()
+            self.latest_id = None
+            self.resets += 1
+
+        if delta.base_id is None:
+            players = {}
+        else:
+            base = self.snapshots.get(delta.base_id)
+            if base is None:
+                self.missing_base += 1
+                self.resync_requested = True
+                return None
+            players = dict(base)
+
+        for player in delta.players:
+            players[player.user_id] = player
+        for user_id in delta.removed:
+            players.pop(user_id, None)
+
+        self.snapshots[delta.snapshot_id] = players
+        while len(self.snapshots) > self.history:
+            self.snapshots.popitem(last=False)
+        self.latest_id = delta.snapshot_id
+        self.resync_requested = False
+        self.applied += 1
+
+        return GameState(
+            players=list(players.values()),
+            song=delta.song,
+            locationTitle=delta.location_title,
+            arrowCombination=delta.arrow_combination,
+            scores=delta.scores,
+            sequence=delta.snapshot_id,
+            serverTime=delta.server_time,
+        )
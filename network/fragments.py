@@ -0,0 +1,155 @@
+import struct
+import time
+from collections import OrderedDict, deque
+
+# Fragmented datagrams start with MAGIC, followed by the snapshot id, the
+# fragment index and the fragment count.
+MAGIC = 0xF7
+HEADER = struct.Struct("<BIHH")
+
+# IPv4 + UDP headers
+IP_UDP_OVERHEAD = 28
+
+MAX_PENDING_SNAPSHOTS = 8
+MAX_PENDING_BYTES = 1 << 20
+REASSEMBLY_TIMEOUT = 1.0
+COMPLETED_HISTORY = 64
+
+
+class FragmentError(Exception):
+    pass
+
+
+def max_datagram_size(mtu):
+    return mtu - IP_UDP_OVERHEAD
+
+
+def is_fragment(data):
+    return len(data) >= HEADER.size and data[0] == MAGIC
+
+
+def split(payload: bytes, snapshot_id, datagram_size):
+    chunk_size = datagram_size - HEADER.size
+    count = max(1, -(-len(payload) // chunk_size))
+    if count > 0xFFFF:
+        raise FragmentError("Payload needs too many fragments")
+    snapshot_id &= 0xFFFFFFFF
+    return [
+        HEADER.pack(MAGIC, snapshot_id, index, count)
+        + payload[index * chunk_size : (index + 1) * chunk_size]
+        for index in range(count)
+    ]
+
+
+class _PartialSnapshot:
+    def __init__(self, count, started_at):
+        self.fragments = [None] * count
+        self.received = 0
+        self.size = 0
+        self.started_at = started_at
+
+
+class Reassembler:
+    """Collects fragments until every part of a snapshot has arrived.
+
+    Memory is bounded by the number of snapshots and bytes held at once;
+    the oldest incomplete snapshots are evicted first, and any snapshot
+    still incomplete after `timeout` seconds is dropped.
+    """
+
+    def __init__(
+        self,
+        max_pending=MAX_PENDING_SNAPSHOTS,
+        max_bytes=MAX_PENDING_BYTES,
+        timeout=REASSEMBLY_TIMEOUT,
+    ):
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.pending = OrderedDict()
+        self.pending_bytes = 0
+        self.recently_completed = deque(maxlen=COMPLETED_HISTORY)
+
+        self.completed = 0
+        self.duplicates = 0
+        self.expired = 0
+        self.evicted = 0
+        self.malformed = 0
+
+    def add(self, datagram, now=None):
+        """Returns the reassembled payload once the last fragment arrives."""
+        if now is None:
+            now = time.monotonic()
+        self._expire(now)
+
+        _, snapshot_id, index, count = HEADER.unpack_from(datagram, 0)
+        if count == 0 or index >= count:
+            self.malformed += 1
+            return None
+        if snapshot_id in self.recently_completed:
+            self.duplicates += 1
+            return None
+
+        chunk = datagram[HEADER.size :]
+        if count == 1:
+            self._complete(snapshot_id)
+            return bytes(chunk)
+
+        partial = self.pending.get(snapshot_id)
+        if partial is None:
+            partial = _PartialSnapshot(count, now)
+            self.pending[snapshot_id] = partial
+        elif len(partial.fragments) != count:
+            self.malformed += 1
+            return None
+
+        if partial.fragments[index] is not None:
+            self.duplicates += 1
+            return None
+        partial.fragments[index] = chunk
+        partial.received += 1
+        partial.size += len(chunk)
+        self.pending_bytes += len(chunk)
+
+        if partial.received == count:
+            self._drop(snapshot_id)
+            self._complete(snapshot_id)
+            return b"".join(partial.fragments)
+
+        self._evict()
+        return None
+
+    def _complete(self, snapshot_id):
+        self.recently_completed.append(snapshot_id)
+        self.completed += 1
+
+    def _drop(self, snapshot_id):
+        partial = self.pending.pop(snapshot_id)
+        self.pending_bytes -= partial.size
+
+    def _expire(self, now):
+        while self.pending:
+            snapshot_id, partial = next(iter(self.pending.items()))
+            if now - partial.started_at < self.timeout:
+                break
+            self._drop(snapshot_id)
+            self.expired += 1
+
+    def _evict(self):
+        while self.pending and (
+            len(self.pending) > self.max_pending
+            or self.pending_bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self.pending)))
+            self.evicted += 1
+
+    def get_stats(self):
+        return {
+            "pending": len(self.pending),
+            "pending_bytes": self.pending_bytes,
+            "completed": self.completed,
+            "duplicates": self.duplicates,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "malformed": self.malformed,
+        }
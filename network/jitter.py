@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+
+JITTER_BUFFER_CAPACITY = 32
+
+
+class JitterBuffer:
+    """Plays game states back `delay` seconds behind the server.
+
+    States are timestamped with the server time when the server sends it,
+    mapped onto the local clock through the smallest transit time seen so
+    far, or with their arrival time otherwise. Every frame, sample() returns
+    the two states bracketing the render time so positions can be blended
+    between them, which hides jitter smaller than `delay`.
+
+    A state older than the render time is dropped as late; a render time
+    past the newest state is an underrun.
+    """
+
+    def __init__(self, delay, capacity=JITTER_BUFFER_CAPACITY):
+        self.delay = delay
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._states = deque()
+        self._clock_offset = None
+        self._render_time = None
+        self._starved = False
+
+        self.published = 0
+        self.late_drops = 0
+        self.overflows = 0
+        self.underruns = 0
+
+    def _timestamp(self, state, now):
+        if state.server_time is None:
+            return now
+        server_time = state.server_time / 1000
+        if self._clock_offset is None or now - server_time < self._clock_offset:
+            self._clock_offset = now - server_time
+        return server_time + self._clock_offset
+
+    def publish(self, state, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self.published += 1
+            timestamp = self._timestamp(state, now)
+            if self._states and timestamp <= self._states[-1][0]:
+                self.late_drops += 1
+                return
+            if self._render_time is not None and timestamp <= self._render_time:
+                self.late_drops += 1
+                return
+            self._states.append((timestamp, state))
+            if len(self._states) > self.capacity:
+                self._states.popleft()
+                self.overflows += 1
+
+    def sample(self, now=None):
+        """Returns (previous, current, alpha) at the render time, or None.
+
+        `previous` is the newest state at or before the render time,
+        `current` the one after it, and `alpha` how far the render time is
+        from `previous` to `current`. Both are the newest state, with alpha
+        1, during an underrun.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            render_time = now - self.delay
+            if self._render_time is not None:
+                render_time = max(render_time, self._render_time)
+            self._render_time = render_time
+
+            states = self._states
+            if not states or states[0][0] > render_time:
+                return None
+            while len(states) > 1 and states[1][0] <= render_time:
+                states.popleft()
+            if len(states) == 1:
+                # Nothing newer than the render time to blend towards.
+                if not self._starved:
+                    self.underruns += 1
+                self._starved = True
+                return states[-1][1], states[-1][1], 1.0
+
+            self._starved = False
+            (previous_time, previous), (current_time, current) = states[0], states[1]
+            alpha = (render_time - previous_time) / (current_time - previous_time)
+            return previous, current, alpha
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "depth": len(self._states),
+                "delay_ms": self.delay * 1000,
+                "published": self.published,
+                "late_drops": self.late_drops,
+                "overflows": self.overflows,
+                "underruns": self.underruns,
+            }
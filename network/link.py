@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+
+RTT_GAIN = 1 / 8
+RTT_VARIANCE_GAIN = 1 / 4
+JITTER_GAIN = 1 / 16
+MAX_OUTSTANDING_PROBES = 16
+
+
+class LinkEstimator:
+    """Estimates round-trip time and jitter from echoed probe sequence numbers.
+
+    Smoothed RTT and its variance follow RFC 6298; jitter is the smoothed
+    difference between consecutive RTT samples, as in RFC 3550.
+
+    Servers echo a probe in the next game state they broadcast, so every
+    sample also includes the time the server held the echo, up to one
+    broadcast interval (50 ms at 20 states/s): the estimate is an upper
+    bound on the network round trip, and part of the jitter is the server's.
+    """
+
+    def __init__(self):
+        self._outstanding = OrderedDict()
+        self.next_seq = 0
+        self.rtt = None
+        self.rtt_variance = None
+        self.last_rtt = None
+        self.jitter = 0.0
+        self.samples = 0
+
+    def on_probe_sent(self, now=None):
+        seq = self.next_seq
+        self.next_seq += 1
+        self._outstanding[seq] = time.monotonic() if now is None else now
+        while len(self._outstanding) > MAX_OUTSTANDING_PROBES:
+            self._outstanding.popitem(last=False)
+        return seq
+
+    def on_echo(self, seq, now=None):
+        sent_at = self._outstanding.get(seq)
+        if sent_at is None:
+            # Servers echo the latest probe in every state; count it once.
+            return
+        # Older probes can no longer be answered in order.
+        while self._outstanding:
+            outstanding_seq, _ = self._outstanding.popitem(last=False)
+            if outstanding_seq == seq:
+                break
+
+        sample = (time.monotonic() if now is None else now) - sent_at
+        if self.rtt is None:
+            self.rtt = sample
+            self.rtt_variance = sample / 2
+        else:
+            self.rtt_variance += RTT_VARIANCE_GAIN * (
+                abs(self.rtt - sample) - self.rtt_variance
+            )
+            self.rtt += RTT_GAIN * (sample - self.rtt)
+            self.jitter += JITTER_GAIN * (abs(sample - self.last_rtt) - self.jitter)
+        self.last_rtt = sample
+        self.samples += 1
+
+    def get_stats(self):
+        def to_ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            "rtt_ms": to_ms(self.rtt),
+            "rtt_variance_ms": to_ms(self.rtt_variance),
+            "last_rtt_ms": to_ms(self.last_rtt),
+            "jitter_ms": to_ms(self.jitter),
+            "samples": self.samples,
+        }
@@ -0,0 +1,38 @@
+import threading
+
+
+class StateMailbox:
+    """Hands the newest game state from the network thread to the render thread.
+
+    Only the latest published state is kept; anything published before the
+    render thread got to it is counted as superseded and dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self.published = 0
+        self.applied = 0
+        self.superseded = 0
+
+    def publish(self, state):
+        with self._lock:
+            if self._state is not None:
+                self.superseded += 1
+            self._state = state
+            self.published += 1
+
+    def take(self):
+        with self._lock:
+            state = self._state
+            self._state = None
+            if state is not None:
+                self.applied += 1
+            return state
+
+    def get_stats(self):
+        return {
+            "published": self.published,
+            "applied": self.applied,
+            "superseded": self.superseded,
+        }
@@ -0,0 +1,281 @@
+import json
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from models import GameState, PlayerState
+from network.codec import STATUSES, STATUS_CODES, MARKS, MARK_CODES
+
+RING_HEADER = struct.Struct("<QII")  # latest sequence, slot count, slot size
+SLOT_HEADER = struct.Struct("<QI")  # sequence, payload size
+# Players, identity generation, identities size, rest of the state size.
+STATE_HEADER = struct.Struct("<IIII")
+# One per player, in the order of the identities.
+PLAYER_RECORD = np.dtype(
+    [("position", "<f8", 2), ("status", "<i1"), ("mark", "<i1")]
+)  # position is (longitude, latitude)
+
+RING_SLOTS = 4
+RING_SLOT_SIZE = 256 * 1024
+# Seconds the worker gets to exit on its own before it is killed.
+WORKER_EXIT_TIMEOUT = 2
+
+
+class PlayerRecords:
+    """The players of a state read from a StateRing.
+
+    Positions, statuses and marks are numeric `records`, one per player in
+    the order of `identities`, which are only rebuilt when `generation`
+    changes. Iterating builds full PlayerStates, one per record.
+    """
+
+    def __init__(self, generation, identities, records):
+        self.generation = generation
+        self.identities = identities
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        for identity, (longitude, latitude), status, mark in zip(
+            self.identities,
+            self.records["position"].tolist(),
+            self.records["status"].tolist(),
+            self.records["mark"].tolist(),
+        ):
+            yield identity.model_copy(
+                update={
+                    "longitude": longitude,
+                    "latitude": latitude,
+                    "status": STATUSES[status],
+                    "last_mark": MARKS[mark],
+                }
+            )
+
+
+def _identity(user_id, username, color, is_main):
+    return PlayerState.model_construct(
+        user_id=user_id,
+        username=username,
+        color=color,
+        is_main=is_main,
+        latitude=0.0,
+        longitude=0.0,
+        status=None,
+        last_mark=None,
+    )
+
+
+class StateRing:
+    """Single-writer ring of game states in shared memory.
+
+    Players are written as fixed-width PLAYER_RECORDs, which the reader
+    copies out with np.frombuffer; their identities are only written again
+    when they change. The rest of the state is small and goes as JSON.
+
+    The writer clears a slot's sequence number before overwriting it and
+    sets it again once the payload is complete; readers check that the
+    sequence number is unchanged after copying it out, so a state torn by
+    a concurrent write is never returned.
+    """
+
+    def __init__(self, name=None, slots=RING_SLOTS, slot_size=RING_SLOT_SIZE):
+        if name is None:
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=RING_HEADER.size + slots * slot_size
+            )
+            RING_HEADER.pack_into(self.memory.buf, 0, 0, slots, slot_size)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        _, self.slots, self.slot_size = RING_HEADER.unpack_from(self.memory.buf, 0)
+        self.name = self.memory.name
+
+        self.published = 0
+        self.oversized = 0
+        self.last_read = 0
+        self.applied = 0
+        self.superseded = 0
+        self.torn = 0
+        # Writer side.
+        self._identities = None
+        self._identities_json = b""
+        self._generation = 0
+        # Reader side.
+        self._players = PlayerRecords(None, [], None)
+
+    def _slot_offset(self, sequence):
+        return RING_HEADER.size + (sequence % self.slots) * self.slot_size
+
+    def publish(self, game_state: GameState):
+        """Writes a state into the next slot; returns its size in bytes."""
+        identities = [
+            (player.user_id, player.username, player.color, player.is_main)
+            for player in game_state.players
+        ]
+        if identities != self._identities:
+            self._identities = identities
+            self._identities_json = json.dumps(identities).encode()
+            self._generation += 1
+        records = np.array(
+            [
+                (
+                    (player.longitude, player.latitude),
+                    STATUS_CODES.get(player.status, 0),
+                    MARK_CODES.get(player.last_mark, 0),
+                )
+                for player in game_state.players
+            ],
+            dtype=PLAYER_RECORD,
+        ).tobytes()
+        rest = (
+            game_state.model_copy(update={"players": []})
+            .model_dump_json(by_alias=True)
+            .encode()
+        )
+        parts = (
+            STATE_HEADER.pack(
+                len(identities), self._generation, len(self._identities_json), len(rest)
+            ),
+            records,
+            self._identities_json,
+            rest,
+        )
+        size = sum(map(len, parts))
+        if size > self.slot_size - SLOT_HEADER.size:
+            self.oversized += 1
+            return None
+
+        buffer = self.memory.buf
+        sequence = RING_HEADER.unpack_from(buffer, 0)[0] + 1
+        offset = self._slot_offset(sequence)
+        SLOT_HEADER.pack_into(buffer, offset, 0, 0)
+        start = offset + SLOT_HEADER.size
+        for part in parts:
+            buffer[start : start + len(part)] = part
+            start += len(part)
+        SLOT_HEADER.pack_into(buffer, offset, sequence, size)
+        struct.pack_into("<Q", buffer, 0, sequence)
+        self.published += 1
+        return size
+
+    def read_latest(self):
+        """Returns the newest published state, or None if there is none.
+
+        Its players are PlayerRecords.
+        """
+        buffer = self.memory.buf
+        sequence = RING_HEADER.unpack_from(buffer, 0)[0]
+        if sequence == self.last_read:
+            return None
+
+        offset = self._slot_offset(sequence)
+        if SLOT_HEADER.unpack_from(buffer, offset)[0] != sequence:
+            self.torn += 1
+            return None
+        start = offset + SLOT_HEADER.size
+        try:
+            count, generation, identities_size, rest_size = STATE_HEADER.unpack_from(
+                buffer, start
+            )
+            start += STATE_HEADER.size
+            records = np.frombuffer(buffer, PLAYER_RECORD, count, start).copy()
+            start += records.nbytes
+            identities_json = None
+            if generation != self._players.generation:
+                identities_json = bytes(buffer[start : start + identities_size])
+            start += identities_size
+            rest = bytes(buffer[start : start + rest_size])
+        except ValueError:
+            # Sizes read from a slot being overwritten.
+            rest = None
+        if SLOT_HEADER.unpack_from(buffer, offset)[0] != sequence or rest is None:
+            self.torn += 1
+            return None
+
+        game_state = GameState.model_validate_json(rest)
+        if identities_json is not None:
+            identities = [_identity(*fields) for fields in json.loads(identities_json)]
+        else:
+            identities = self._players.identities
+        self._players = PlayerRecords(generation, identities, records)
+        # Built without validation: the players are records, not a list.
+        game_state = GameState.model_construct(
+            **dict(game_state, players=self._players)
+        )
+
+        self.superseded += sequence - self.last_read - 1
+        self.last_read = sequence
+        self.applied += 1
+        return game_state
+
+    def close(self):
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def get_stats(self):
+        return {
+            "applied": self.applied,
+            "superseded": self.superseded,
+            "torn": self.torn,
+        }
+
+
+def _run_worker(ring_name, commands, user_id, token, location):
+    # Imported here so only the worker process opens the socket.
+    from network import udp
+
+    ring = StateRing(ring_name)
+    udp.initialize_client(user_id, token, ring.publish, location, offload=False)
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        name, args = command
+        getattr(udp, name)(*args)
+    # Returning, rather than being killed, runs the worker's atexit handlers,
+    # which dump its stats and close its capture.
+    udp.close_client()
+    ring.close()
+
+
+class OffloadClient:
+    """Runs the network client and its decoding in a separate process.
+
+    The worker owns the socket and publishes every decoded state into a
+    shared-memory StateRing; the UI process polls the newest one once per
+    frame. Outgoing events are forwarded to the worker through a queue.
+    """
+
+    def __init__(self, user_id, token, location=None):
+        context = multiprocessing.get_context("spawn")
+        self.ring = StateRing()
+        self.commands = context.SimpleQueue()
+        self.process = context.Process(
+            target=_run_worker,
+            args=(self.ring.name, self.commands, user_id, token, location),
+            daemon=True,
+        )
+        self.process.start()
+
+    def send(self, command, *args):
+        self.commands.put((command, args))
+
+    def poll(self, update_state):
+        game_state = self.ring.read_latest()
+        if game_state:
+            update_state(game_state)
+
+    def close(self):
+        self.commands.put(None)
+        self.process.join(WORKER_EXIT_TIMEOUT)
+        if self.process.is_alive():
+            # pygame, imported by the worker, swallows SIGTERM.
+            self.process.kill()
+            self.process.join()
+        self.ring.close()
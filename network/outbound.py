@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+
+SEND_TICK_RATE = 30
+SEND_RATE_LIMIT = 20
+
+
+class OutboundQueue:
+    """Buffers outgoing events until the next network tick.
+
+    Moves are coalesced so that only the latest one is sent; status changes
+    and marks are kept in order and go out before the pending move. At most
+    `rate_limit` messages per second are sent, anything above that waits
+    for a later tick.
+
+    Messages are queued as callables and only built when they are sent, so
+    coalesced moves are never signed.
+    """
+
+    def __init__(self, rate_limit=SEND_RATE_LIMIT):
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._ordered = deque()
+        self._move = None
+        self._tokens = float(rate_limit)
+        self._last_refill = time.monotonic()
+
+        self.queued = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.throttled_ticks = 0
+
+    def put_move(self, build_message):
+        with self._lock:
+            if self._move is not None:
+                self.coalesced += 1
+            self._move = ("move", build_message)
+            self.queued += 1
+
+    def put(self, event, build_message):
+        with self._lock:
+            self._ordered.append((event, build_message))
+            self.queued += 1
+
+    def flush(self, send, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            pending = []
+            while self._ordered and self._tokens >= 1:
+                pending.append(self._ordered.popleft())
+                self._tokens -= 1
+            if self._move is not None and self._tokens >= 1:
+                pending.append(self._move)
+                self._move = None
+                self._tokens -= 1
+            if self._ordered or self._move is not None:
+                self.throttled_ticks += 1
+            self.sent += len(pending)
+
+        for event, build_message in pending:
+            send(build_message(), event)
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.rate_limit, self._tokens + elapsed * self.rate_limit)
+
+    def get_stats(self):
+        return {
+            "queued": self.queued,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "throttled_ticks": self.throttled_ticks,
+            "pending": len(self._ordered) + (self._move is not None),
+        }
@@ -0,0 +1,107 @@
+import hashlib
+import hmac
+import json
+
+from network import codec
+
+
+def jsonify(contents):
+    return json.dumps(
+        contents, sort_keys=False, separators=(",", ":"), ensure_ascii=False
+    )
+
+
+class MessageSigner:
+    """Builds signed event datagrams for one session.
+
+    The HMAC is keyed once and cloned per message, and every event type
+    has a pre-serialized byte template so only the payload and its digest
+    are spliced in. Messages whose contents never vary (hello, status and
+    mark values) are built once and reused.
+
+    The extra bytes of a message are appended outside its signed contents:
+    JSON fields (each starting with ", ") for JSON messages, and
+    codec.encode_link bytes for binary ones.
+    """
+
+    def __init__(self, user_id, token):
+        self.user_id = str(user_id)
+        self.token = token
+        self._hmac = hmac.new(token.encode("utf-8"), digestmod=hashlib.sha256)
+        quoted_user_id = json.dumps(self.user_id)
+        self._json_prefixes = {
+            event: (
+                f'{{"userId": {quoted_user_id}, "event": "{event}", "contents": '
+            ).encode()
+            for event in codec.EVENTS
+            if event
+        }
+        self._binary_prefixes = {
+            event: codec.encode_event_prefix(self.user_id, event)
+            for event in codec.EVENTS
+            if event
+        }
+        self._constant_messages = {}
+
+    def digest(self, contents: bytes):
+        signature = self._hmac.copy()
+        signature.update(contents)
+        return signature
+
+    def sign_json(self, event, contents: bytes, extra=b""):
+        return b"".join(
+            (
+                self._json_prefixes[event],
+                contents,
+                b', "hmac": "',
+                self.digest(contents).hexdigest().encode(),
+                b'"',
+                extra,
+                b"}",
+            )
+        )
+
+    def sign_binary(self, event, contents: bytes):
+        return self._binary_prefixes[event] + contents + self.digest(contents).digest()
+
+    def hello(self, location_id, formats, extra=b""):
+        key = ("hello", location_id)
+        prefix = self._constant_messages.get(key)
+        if prefix is None:
+            prefix = self.sign_json(
+                "hello", jsonify(location_id).encode(), self._formats(formats)
+            )[:-1]
+            self._constant_messages[key] = prefix
+        return prefix + extra + b"}"
+
+    def move(self, x, y, binary=False, extra=b""):
+        if binary:
+            return self.sign_binary("move", codec.encode_move(y, x)) + extra
+        return self.sign_json(
+            "move", f'{{"latitude":{y!r},"longitude":{x!r}}}'.encode(), extra
+        )
+
+    def status(self, status, binary=False, extra=b""):
+        return self._constant("status", status, binary, extra)
+
+    def mark(self, mark, binary=False, extra=b""):
+        return self._constant("mark", mark, binary, extra)
+
+    def _constant(self, event, value, binary, extra):
+        key = (event, value, binary)
+        message = self._constant_messages.get(key)
+        if message is None:
+            if binary:
+                encode = codec.encode_status if event == "status" else codec.encode_mark
+                message = self.sign_binary(event, encode(value))
+            else:
+                # Cached without the closing brace, so extra fields fit in.
+                message = self.sign_json(event, jsonify(value).encode())[:-1]
+            self._constant_messages[key] = message
+        if binary:
+            return message + extra
+        return message + extra + b"}"
+
+    @staticmethod
+    def _formats(formats):
+        return f', "formats": {json.dumps(formats)}'.encode()
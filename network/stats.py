@@ -0,0 +1,113 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Bucket upper bounds in seconds, doubling from 1 µs to roughly 4 s.
+DEFAULT_BOUNDS = [1e-6 * 2**i for i in range(23)]
+
+
+class Histogram:
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= threshold:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.max)
+                return self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+class NetworkStats:
+    """Counters and timing histograms for the network path.
+
+    Written from the network loop and read from the render thread, so every
+    access goes through one lock.
+    """
+
+    JITTER_GAIN = 1 / 16
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.packets_in = defaultdict(int)
+        self.bytes_in = defaultdict(int)
+        self.packets_out = defaultdict(int)
+        self.bytes_out = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(Histogram)
+        self.interarrival = Histogram()
+        self.arrival_jitter = 0.0
+        self._last_arrival = None
+        self._last_gap = None
+
+    def on_received(self, kind, size, now):
+        with self._lock:
+            self.packets_in[kind] += 1
+            self.bytes_in[kind] += size
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self.interarrival.record(gap)
+                if self._last_gap is not None:
+                    self.arrival_jitter += self.JITTER_GAIN * (
+                        abs(gap - self._last_gap) - self.arrival_jitter
+                    )
+                self._last_gap = gap
+            self._last_arrival = now
+
+    def on_sent(self, event, size):
+        with self._lock:
+            self.packets_out[event] += 1
+            self.bytes_out[event] += size
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def time(self, name, seconds):
+        with self._lock:
+            self.timings[name].record(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "packets_in": dict(self.packets_in),
+                "bytes_in": dict(self.bytes_in),
+                "packets_out": dict(self.packets_out),
+                "bytes_out": dict(self.bytes_out),
+                "counters": dict(self.counters),
+                "timings": {
+                    name: histogram.summary()
+                    for name, histogram in self.timings.items()
+                },
+                "interarrival": self.interarrival.summary(),
+                "arrival_jitter": self.arrival_jitter,
+            }
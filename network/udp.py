@@ -1,4 +1,7 @@
+import asyncio
+import atexit
 import os
+import re
 import socket
 import json
 import hmac
@@ -7,18 +10,57 @@ import threading
 import time
 
 from dotenv import load_dotenv
-from pydantic import ValidationError
+from pydantic import Field, TypeAdapter, ValidationError
+from typing import Annotated, Union
 
-from models import GameState
+from models import GameState, GameStateDelta
+from network import codec, compression, fragments
+from network.capture import CaptureWriter
+from network.offload import OffloadClient
+from network.delta import SnapshotTable
+from network.link import LinkEstimator
+from network.outbound import OutboundQueue, SEND_TICK_RATE, SEND_RATE_LIMIT
+from network.signing import MessageSigner
+from network.stats import NetworkStats
 
 load_dotenv()
 
 UDP_ADDRESS = os.getenv("UDP_ADDRESS")
-UDP_PORT = int(os.getenv("UDP_PORT"))
+UDP_PORT = int(os.getenv("UDP_PORT", 0))
 
 SERVER_ADDRESS = (UDP_ADDRESS, UDP_PORT)
-BUFFER_SIZE = 1024
-client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+# A hello goes out once the client has not sent any other signed message
+# for HELLO_INTERVAL seconds. Every message carries the RTT probe and the
+# acknowledgements, so moving clients keep measuring and acknowledging.
+HELLO_INTERVAL = 1
+
+# Game states bigger than one datagram arrive in fragments sized to the MTU.
+UDP_MTU = int(os.getenv("UDP_MTU", 1500))
+MAX_DATAGRAM_SIZE = fragments.max_datagram_size(UDP_MTU)
+RECEIVE_QUEUE_DATAGRAMS = 256
+
+# Moves, status changes and marks are flushed once per tick, capped at
+# SEND_RATE_LIMIT messages per second.
+SEND_INTERVAL = 1 / int(os.getenv("SEND_TICK_RATE", SEND_TICK_RATE))
+
+# Network stats are written to this file as JSON when the client exits.
+STATS_FILE = os.getenv("NET_STATS_FILE")
+# Every received datagram is appended to this file for offline replay.
+CAPTURE_FILE = os.getenv("NET_CAPTURE_FILE")
+# Receive and decode game states in a separate worker process.
+OFFLOAD_DECODE = os.getenv("NET_OFFLOAD_DECODE") == "1"
+# Game states are played back this many seconds late to hide jitter;
+# 0 applies every state as soon as it arrives.
+JITTER_BUFFER_DELAY = int(os.getenv("JITTER_BUFFER_MS", 0)) / 1000
+# Game states arrive at most this many sequence numbers late; a sequence
+# number further below the latest one means the server restarted.
+SEQUENCE_REORDER_WINDOW = 32
+
+# Per-datagram zlib compression with a preset dictionary is offered to the
+# server unless disabled; a dictionary built from recorded traffic (see
+# compression_bench.py) is offered ahead of the built-in one when given.
+COMPRESSION = os.getenv("NET_COMPRESSION", "1") == "1"
+COMPRESSION_DICTIONARY = os.getenv("NET_COMPRESSION_DICTIONARY")
 
 
 def calculate_hmac(contents, token):
@@ -28,82 +70,442 @@ def calculate_hmac(contents, token):
     return hmac_result.hexdigest()
 
 
-def jsonify(contents):
-    return json.dumps(
-        contents, sort_keys=False, separators=(",", ":"), ensure_ascii=False
+location_id = os.getenv("LOCATION_ID")
+
+# Formats offered to the server in hello messages, in order of preference.
+# Outgoing events switch to the binary format once the server has answered
+# with a binary game state; JSON is always accepted.
+WIRE_FORMATS = os.getenv("WIRE_FORMATS", "binary,json").split(",")
+wire_format = codec.JSON_FORMAT
+player_table = codec.PlayerTable()
+snapshot_table = SnapshotTable()
+reassembler = fragments.Reassembler()
+latest_sequence: int | None = None
+compressor = compression.Compressor()
+compression_offer = []
+if COMPRESSION and COMPRESSION_DICTIONARY:
+    compressor.add_dictionary(
+        compression.CUSTOM_DICTIONARY,
+        compression.load_dictionary(COMPRESSION_DICTIONARY),
     )
+    compression_offer.append(compression.CUSTOM_DICTIONARY)
+if COMPRESSION:
+    compression_offer.append(compression.BUILTIN_DICTIONARY)
+# Outgoing events are compressed once the server has sent compressed states.
+outgoing_dictionary: int | None = None
+outbound = OutboundQueue(int(os.getenv("SEND_RATE_LIMIT", SEND_RATE_LIMIT)))
+link = LinkEstimator()
+last_signed_send = 0.0
+stats = NetworkStats()
+capture: CaptureWriter | None = None
+offload_client: OffloadClient | None = None
 
+# All network I/O runs on a single event loop owned by a dedicated thread.
+# The public functions below may be called from any thread (usually the
+# pygame loop) and hand their datagrams over to that loop.
+event_loop: asyncio.AbstractEventLoop | None = None
+transport: asyncio.DatagramTransport | None = None
+_loop_thread: threading.Thread | None = None
+_session_credentials = None
+signer: MessageSigner | None = None
 
-location_id = os.getenv("LOCATION_ID")
+
+class ClientProtocol(asyncio.DatagramProtocol):
+    def __init__(self, update_state):
+        self.update_state = update_state
+
+    def datagram_received(self, data, addr):
+        if capture:
+            capture.write(data)
+        handle_datagram(data, self.update_state)
+
+    def error_received(self, exc):
+        print(f"UDP error: {exc}")
+
+
+def _send(data):
+    if event_loop is None or transport is None:
+        return
+    if threading.current_thread() is _loop_thread:
+        transport.sendto(data)
+    else:
+        event_loop.call_soon_threadsafe(transport.sendto, data)
+
+
+def _send_signed(data, event):
+    global last_signed_send
+    last_signed_send = time.monotonic()
+    if outgoing_dictionary is not None:
+        data = compressor.compress(data, outgoing_dictionary)
+    stats.on_sent(event, len(data))
+    _send(data)
 
 
 def send_hello_message(user_id, token):
-    contents = location_id
-    message = {
-        "userId": str(user_id),
-        "event": "hello",
-        "contents": contents,
-        "hmac": calculate_hmac(jsonify(contents), token),
-    }
-    client_socket.sendto(json.dumps(message).encode(), SERVER_ADDRESS)
+    extra = _link_fields(binary=False)
+    if compression_offer:
+        extra += b', "compression": %s' % json.dumps(compression_offer).encode()
+    message = _get_signer(user_id, token).hello(location_id, WIRE_FORMATS, extra)
+    _send_signed(message, "hello")
+
+
+def _link_fields(binary):
+    """The unsigned fields appended to every outgoing message."""
+    # The server echoes the sequence number back in game states, which
+    # gives round-trip time samples.
+    seq = link.on_probe_sent()
+    # Acknowledge the latest binary state, so the server stops announcing
+    # the player identities it carried, or the latest delta snapshot, so the
+    # server can base the next deltas on it. Ask for a keyframe when a base
+    # snapshot went missing.
+    ack = _acknowledged_sequence()
+    resync = snapshot_table.resync_requested
+    if binary:
+        return codec.encode_link(seq, ack, resync)
+    extra = b', "seq": %d' % seq
+    if ack is not None:
+        extra += b', "ack": %d' % ack
+    if resync:
+        extra += b', "resync": true'
+    return extra
+
 
+def _acknowledged_sequence():
+    if wire_format == codec.BINARY_FORMAT:
+        return player_table.latest_sequence
+    return snapshot_table.latest_id
 
-def handle_hello(user_id, token):
+
+async def handle_hello(user_id, token):
     while True:
-        send_hello_message(user_id, token)
-        time.sleep(1)  # 1 Hz updates
+        idle = time.monotonic() - last_signed_send
+        if idle >= HELLO_INTERVAL:
+            send_hello_message(user_id, token)
+            idle = 0
+        await asyncio.sleep(HELLO_INTERVAL - idle)
 
 
-def handle_receiving(update_state):
+async def handle_outbound():
     while True:
-        data, _ = client_socket.recvfrom(BUFFER_SIZE)
-        parsed_data = json.loads(data.decode())
+        outbound.flush(_send_signed)
+        await asyncio.sleep(SEND_INTERVAL)
+
+
+def handle_datagram(data, update_state):
+    global latest_sequence
+    if fragments.is_fragment(data):
+        stats.on_received("fragment", len(data), time.monotonic())
+        data = reassembler.add(data)
+        if data is None:
+            return
+    if compression.is_compressed(data):
+        data = _decompress(data)
+        if data is None:
+            return
+    sequence, keyframe = _peek_state(data)
+    stale = _is_stale(sequence, keyframe)
+    if stale:
+        return
+    state = decode_payload(data)
+    if state is None:
+        return
+    if stale is None:
+        sequence, keyframe = _decoded_state(state)
+        if _is_stale(sequence, keyframe):
+            return
+    if isinstance(state, GameStateDelta):
+        state = _apply_delta(state)
+        if state is None:
+            return
+    # Only advanced once decoded, so a corrupt state cannot hold back the
+    # ones after it.
+    if sequence is not None:
+        latest_sequence = sequence
+    update_state(state)
+
+
+def _decompress(data):
+    global outgoing_dictionary
+    stats.count("compressed")
+    stats.count("compressed_bytes", len(data))
+    started_at = time.perf_counter()
+    try:
+        payload, dictionary_id = compressor.decompress(data)
+    except compression.CompressionError as e:
+        stats.count("malformed")
+        print(f"Received faulty compressed datagram: {e}")
+        return None
+    stats.time("decompress", time.perf_counter() - started_at)
+    outgoing_dictionary = dictionary_id
+    return payload
+
+
+# Servers put the sequence of a state first, or the snapshot id of a delta
+# followed by its base id. Anywhere else these keys could belong to nested
+# objects, such as the scores keyed by username, so such states are only
+# told apart once decoded.
+STATE_HEAD = re.compile(
+    rb'\A\{\s*"(?P<key>sequence|snapshotId)"\s*:\s*(?P<sequence>\d+)'
+    rb'(?P<base>\s*,\s*"baseId"\s*:\s*\d)?'
+)
+DELTA_KEY = re.compile(rb'\A\{\s*"snapshotId"\s*:')
+# Tried in order, so a state is only a delta with a top-level snapshot id.
+STATE_ADAPTER = TypeAdapter(
+    Annotated[Union[GameStateDelta, GameState], Field(union_mode="left_to_right")]
+)
+
+
+def _peek_state(data):
+    """Returns the sequence of a state and whether it is a keyframe, without
+    decoding it; either is None when it cannot be told yet.
+
+    Keyframes are the delta snapshots without a base.
+    """
+    if codec.is_binary(data):
+        return codec.peek_sequence(data), False
+    match = STATE_HEAD.match(data)
+    if match is None:
+        return None, None
+    sequence = int(match["sequence"])
+    if match["key"] == b"sequence" or match["base"]:
+        return sequence, False
+    return sequence, None if b'"baseId"' in data else True
+
+
+def _decoded_state(state):
+    if isinstance(state, GameStateDelta):
+        return state.snapshot_id, state.base_id is None
+    return state.sequence, False
+
+
+def _is_stale(sequence, keyframe):
+    """Tells whether a state is older than the newest one, None when that
+    cannot be told before it is decoded.
+
+    A state far older than the newest one, or a keyframe older than it, is
+    taken to come from a restarted server and starts the sequence over.
+    """
+    if sequence is None:
+        return None
+    if latest_sequence is None or sequence > latest_sequence:
+        return False
+    if latest_sequence - sequence > SEQUENCE_REORDER_WINDOW:
+        stats.count("sequence_resets")
+        return False
+    if sequence < latest_sequence:
+        if keyframe is None:
+            return None
+        if keyframe:
+            stats.count("sequence_resets")
+            return False
+    stats.count("stale")
+    return True
+
+
+def decode_payload(data):
+    global wire_format
+    if codec.is_binary(data):
+        stats.on_received("binary", len(data), time.monotonic())
+        started_at = time.perf_counter()
         try:
-            game_state = GameState(**parsed_data)
-            update_state(game_state)
-        except ValidationError as e:
-            print(f"Received faulty game state: {e}")
+            game_state = codec.decode_game_state(data, player_table)
+        except (codec.CodecError, ValidationError) as e:
+            if isinstance(e, codec.TruncatedError):
+                stats.count("truncated")
+            stats.count("validation_failures")
+            print(f"Received faulty binary game state: {e}")
+            return None
+        stats.time("binary_decode", time.perf_counter() - started_at)
+        if codec.BINARY_FORMAT in WIRE_FORMATS:
+            wire_format = codec.BINARY_FORMAT
+        _handle_echo(game_state)
+        return game_state
 
+    stats.on_received("json", len(data), time.monotonic())
+    started_at = time.perf_counter()
+    try:
+        # Validated straight from the datagram bytes, without building an
+        # intermediate str and dict tree.
+        if DELTA_KEY.match(data):
+            state = GameStateDelta.model_validate_json(data)
+        elif b'"snapshotId"' in data:
+            state = STATE_ADAPTER.validate_json(data)
+        else:
+            state = GameState.model_validate_json(data)
+    except ValidationError as e:
+        _count_json_error(e)
+        print(f"Received faulty game state: {e}")
+        return None
+    stats.time("json_decode", time.perf_counter() - started_at)
+    _handle_echo(state)
+    return state
 
-def initialize_client(user_id, token, update_state):
-    hello_thread = threading.Thread(
-        target=handle_hello, daemon=True, args=(user_id, token)
+
+def _count_json_error(error):
+    error_details = error.errors(include_url=False)
+    if error_details and error_details[0]["type"] == "json_invalid":
+        if "EOF" in error_details[0]["msg"]:
+            stats.count("truncated")
+        stats.count("malformed")
+    else:
+        stats.count("validation_failures")
+
+
+def _handle_echo(state):
+    if state.echo is not None:
+        link.on_echo(state.echo)
+
+
+def _apply_delta(delta):
+    was_resyncing = snapshot_table.resync_requested
+    game_state = snapshot_table.apply(delta)
+    if (
+        snapshot_table.resync_requested
+        and not was_resyncing
+        and _session_credentials
+    ):
+        send_hello_message(*_session_credentials)
+    return game_state
+
+
+async def run_client(user_id, token, update_state):
+    global transport
+    transport, _ = await event_loop.create_datagram_endpoint(
+        lambda: ClientProtocol(update_state), remote_addr=SERVER_ADDRESS
     )
-    hello_thread.start()
-    receive_thread = threading.Thread(
-        target=handle_receiving, daemon=True, args=(update_state,)
+    client_socket = transport.get_extra_info("socket")
+    client_socket.setsockopt(
+        socket.SOL_SOCKET,
+        socket.SO_RCVBUF,
+        MAX_DATAGRAM_SIZE * RECEIVE_QUEUE_DATAGRAMS,
     )
-    receive_thread.start()
+    event_loop.create_task(handle_outbound())
+    await handle_hello(user_id, token)
 
 
-def issue_move(user_id, token, x, y):
-    contents = {"latitude": y, "longitude": x}
-    message = {
-        "userId": str(user_id),
-        "event": "move",
-        "contents": contents,
-        "hmac": calculate_hmac(jsonify(contents), token),
+def initialize_client(
+    user_id, token, update_state, location=None, offload=OFFLOAD_DECODE
+):
+    global event_loop, _loop_thread, _session_credentials, location_id
+    global capture, offload_client
+    if offload:
+        # States then reach update_state through poll_offloaded_state().
+        offload_client = OffloadClient(user_id, token, location)
+        atexit.register(offload_client.close)
+        return
+    if location is not None:
+        location_id = location
+    if STATS_FILE:
+        atexit.register(dump_stats, STATS_FILE)
+    if CAPTURE_FILE and capture is None:
+        capture = CaptureWriter(CAPTURE_FILE)
+        atexit.register(capture.close)
+    _session_credentials = (user_id, token)
+    _get_signer(user_id, token)
+    reset_session()
+    event_loop = asyncio.new_event_loop()
+    _loop_thread = threading.Thread(target=event_loop.run_forever, daemon=True)
+    _loop_thread.start()
+    asyncio.run_coroutine_threadsafe(
+        run_client(user_id, token, update_state), event_loop
+    )
+
+
+def close_client():
+    """Cancels the client's tasks and stops the event loop thread."""
+    asyncio.run_coroutine_threadsafe(_cancel_tasks(), event_loop).result()
+    event_loop.call_soon_threadsafe(event_loop.stop)
+    _loop_thread.join()
+
+
+async def _cancel_tasks():
+    if transport:
+        transport.close()
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def reset_session():
+    """Forgets everything received from the server so far."""
+    global wire_format, player_table, snapshot_table, reassembler, link
+    global latest_sequence, outgoing_dictionary
+    link = LinkEstimator()
+    wire_format = codec.JSON_FORMAT
+    player_table = codec.PlayerTable()
+    snapshot_table = SnapshotTable()
+    reassembler = fragments.Reassembler()
+    latest_sequence = None
+    outgoing_dictionary = None
+
+
+def _get_signer(user_id, token):
+    global signer
+    if signer is None or signer.user_id != str(user_id) or signer.token != token:
+        signer = MessageSigner(user_id, token)
+    return signer
+
+
+def get_link_stats():
+    return link.get_stats()
+
+
+def get_stats():
+    network_stats = stats.snapshot()
+    network_stats["link"] = link.get_stats()
+    network_stats["outbound"] = outbound.get_stats()
+    network_stats["reassembly"] = reassembler.get_stats()
+    network_stats["deltas"] = {
+        "applied": snapshot_table.applied,
+        "stale": snapshot_table.stale,
+        "missing_base": snapshot_table.missing_base,
+        "resets": snapshot_table.resets,
     }
-    client_socket.sendto(json.dumps(message).encode(), SERVER_ADDRESS)
+    if offload_client:
+        network_stats["offload"] = offload_client.ring.get_stats()
+    return network_stats
+
+
+def dump_stats(path):
+    with open(path, "w") as stats_file:
+        json.dump(get_stats(), stats_file, indent=2)
+
+
+def _is_binary():
+    return wire_format == codec.BINARY_FORMAT
+
+
+def _build(sign, *args):
+    # Called at flush time, so the link fields are the latest ones.
+    binary = _is_binary()
+    return sign(*args, binary, _link_fields(binary))
+
+
+def poll_offloaded_state(update_state):
+    if offload_client:
+        offload_client.poll(update_state)
+
+
+def issue_move(user_id, token, x, y):
+    if offload_client:
+        offload_client.send("issue_move", user_id, token, x, y)
+        return
+    signer = _get_signer(user_id, token)
+    outbound.put_move(lambda: _build(signer.move, x, y))
 
 
 def change_status(user_id, token, status):
-    contents = status
-    message = {
-        "userId": str(user_id),
-        "event": "status",
-        "contents": contents,
-        "hmac": calculate_hmac(jsonify(contents), token),
-    }
-    client_socket.sendto(json.dumps(message).encode(), SERVER_ADDRESS)
+    if offload_client:
+        offload_client.send("change_status", user_id, token, status)
+        return
+    signer = _get_signer(user_id, token)
+    outbound.put("status", lambda: _build(signer.status, status))
 
 
 def issue_mark(user_id, token, mark):
-    contents = mark
-    message = {
-        "userId": str(user_id),
-        "event": "mark",
-        "contents": contents,
-        "hmac": calculate_hmac(jsonify(contents), token),
-    }
-    client_socket.sendto(json.dumps(message).encode(), SERVER_ADDRESS)
+    if offload_client:
+        offload_client.send("issue_mark", user_id, token, mark)
+        return
+    signer = _get_signer(user_id, token)
+    outbound.put("mark", lambda: _build(signer.mark, mark))
@@ -0,0 +1,142 @@
+import argparse
+import os
+import random
+import time
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT
+from graphics.screens import ScreenManager, DanceFloorScreen
+from models import GameState, PlayerState, SongState
+
+pygame.init()
+
+screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare player reconcile and draw cost by player count"
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Player counts to render",
+    )
+    parser.add_argument("--states", type=int, default=100, help="States per run")
+    parser.add_argument(
+        "--churn",
+        type=float,
+        default=0.05,
+        help="Share of the players replaced by new ones in every state",
+    )
+    return parser.parse_args()
+
+
+class ScanningDanceFloorScreen(DanceFloorScreen):
+    """Reconciles players as before the player registry: a linear scan of
+    the elements for every player, and a new element for every join."""
+
+    def _update_players(self):
+        elements = list(self.players.values())
+        present = set()
+        for state in self.game_state.players:
+            present.add(state.user_id)
+            for player_element in elements:
+                if player_element.user_id == state.user_id:
+                    player_element.update_state(state)
+                    break
+            else:
+                self._add_player(state)
+
+        for player_element in elements:
+            if player_element.user_id not in present:
+                self._remove_player(player_element.user_id)
+        self.player_pool.clear()
+
+
+def make_player(user_number):
+    return PlayerState(
+        userId=f"bench-{user_number}",
+        username=f"dancer{user_number}",
+        latitude=random.uniform(0, SCREEN_HEIGHT - 100),
+        longitude=random.uniform(0, SCREEN_WIDTH - 100),
+        isMain=user_number == 0,
+        status="dancing" if user_number % 2 else "idle",
+    )
+
+
+def make_states(player_count, count, churn):
+    random.seed(player_count)
+    song = SongState(
+        id="player-bench",
+        title="Benchmark",
+        bpm=120,
+        onset=0,
+        startTimestamp=int(time.time() * 1000),
+    )
+    players = [make_player(i) for i in range(player_count)]
+    next_user_number = player_count
+    states = []
+    for _ in range(count):
+        players = [
+            player.model_copy(
+                update={"latitude": player.latitude + random.uniform(-5, 5)}
+            )
+            for player in players
+        ]
+        for _ in range(int(player_count * churn)):
+            # Anyone but the main player may leave.
+            players[random.randrange(1, player_count)] = make_player(
+                next_user_number
+            )
+            next_user_number += 1
+        states.append(
+            GameState(players=players, song=song, locationTitle="Benchmark floor")
+        )
+    return states
+
+
+def run(screen_class, states):
+    screen_manager = ScreenManager()
+    screen_manager.set_credentials({"userId": "bench-0", "token": ""})
+    dance_floor = screen_class(screen_manager, connect=False)
+    screen_manager.set_screen(dance_floor)
+
+    reconcile_time = draw_time = 0
+    for game_state in states:
+        started_at = time.perf_counter()
+        dance_floor.update_state(game_state)
+        reconciled_at = time.perf_counter()
+        dance_floor.draw(screen)
+        pygame.display.flip()
+        draw_time += time.perf_counter() - reconciled_at
+        reconcile_time += reconciled_at - started_at
+        pygame.event.pump()
+    return reconcile_time / len(states), draw_time / len(states)
+
+
+def main():
+    args = parse_args()
+    print(f"{'players':>7} {'lookup':<9} {'reconcile':>12} {'draw':>10}")
+    for player_count in args.players:
+        states = make_states(player_count, args.states, args.churn)
+        for name, screen_class in (
+            ("scan", ScanningDanceFloorScreen),
+            ("registry", DanceFloorScreen),
+        ):
+            reconcile_time, draw_time = run(screen_class, states)
+            print(
+                f"{player_count:>7} {name:<9} {reconcile_time * 1000:>9.3f} ms "
+                f"{draw_time * 1000:>7.2f} ms"
+            )
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
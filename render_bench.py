@@ -0,0 +1,172 @@
+import argparse
+import os
+import random
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare dance floor frame times across rendering modes"
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Player counts to render",
+    )
+    parser.add_argument("--frames", type=int, default=300, help="Frames per run")
+    parser.add_argument(
+        "--floor",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="Spread the players over a floor this large instead of the window",
+    )
+    parser.add_argument("--window", action="store_true", help="Render to a window")
+    return parser.parse_args()
+
+
+args = parse_args()
+if not args.window:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT, MANTLE
+from graphics.dirty import DirtyRects
+from graphics.render_list import RenderList
+from graphics.screens import ScreenManager, DanceFloorScreen, ArrowDisplay
+from models import GameState, PlayerState, SongState
+
+pygame.init()
+
+screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+pygame.display.set_caption("Twirl render benchmark")
+
+SONG = SongState(
+    id="render-bench",
+    title="Benchmark",
+    bpm=120,
+    onset=0,
+    startTimestamp=int(time.time() * 1000),
+)
+
+
+FLOOR_WIDTH, FLOOR_HEIGHT = args.floor or (SCREEN_WIDTH, SCREEN_HEIGHT)
+
+
+def make_players(count):
+    return [
+        PlayerState(
+            userId=f"bench-{i}",
+            username=f"dancer{i}",
+            latitude=random.uniform(0, FLOOR_HEIGHT - 100),
+            longitude=random.uniform(0, FLOOR_WIDTH - 100),
+            isMain=i == 0,
+            status="dancing" if i % 2 else "idle",
+            color=random.choice(["white", "green", "lavender", "maroon", "yellow"]),
+        )
+        for i in range(count)
+    ]
+
+
+def make_game_state(players):
+    return GameState(
+        players=players,
+        song=SONG,
+        locationTitle="Benchmark floor",
+        arrowCombination=["0", "1", "2", "3"],
+        scores={player.username: i for i, player in enumerate(players[:5])},
+    )
+
+
+def run(player_count, busy, dirty, batched):
+    random.seed(player_count)
+    screen_manager = ScreenManager()
+    screen_manager.set_credentials({"userId": "bench-0", "token": ""})
+    dance_floor = DanceFloorScreen(screen_manager, connect=False)
+    dance_floor.dirty_rects = DirtyRects(MANTLE) if dirty else None
+    dance_floor.render_list = RenderList() if batched else None
+    screen_manager.set_screen(dance_floor)
+
+    players = make_players(player_count)
+    dance_floor.update_state(make_game_state(players))
+
+    frame_time = 0
+    updated_pixels = 0
+    for frame in range(args.frames):
+        if busy and frame % 2 == 0:
+            # A new state every other frame, as at 15-30 states/s.
+            players = [
+                player.model_copy(
+                    update={
+                        "latitude": player.latitude + random.uniform(-20, 20),
+                        "longitude": player.longitude + random.uniform(-20, 20),
+                    }
+                )
+                for player in players
+            ]
+            dance_floor.update_state(make_game_state(players))
+
+        started_at = time.perf_counter()
+        screen_manager.update()
+        dirty_rects = screen_manager.draw(screen)
+        if dirty_rects is None:
+            pygame.display.flip()
+            updated_pixels += SCREEN_WIDTH * SCREEN_HEIGHT
+        else:
+            pygame.display.update(dirty_rects)
+            updated_pixels += sum(rect.width * rect.height for rect in dirty_rects)
+        frame_time += time.perf_counter() - started_at
+        pygame.event.pump()
+
+    return frame_time / args.frames, updated_pixels / args.frames
+
+
+def run_arrows():
+    arrow_combination = ["0", "-1", "2", "-3"]
+    started_at = time.perf_counter()
+    for _ in range(args.frames):
+        arrow_display = ArrowDisplay(arrow_combination)
+    construct_time = (time.perf_counter() - started_at) / args.frames
+
+    started_at = time.perf_counter()
+    for frame in range(args.frames):
+        arrow_display.last_pressed = frame % (len(arrow_combination) + 1) - 1
+        arrow_display.draw(screen)
+    draw_time = (time.perf_counter() - started_at) / args.frames
+    return construct_time, draw_time
+
+
+def main():
+    print(
+        f"{'floor':<6} {'players':>7} {'mode':<6} {'blits':<7} "
+        f"{'frame':>10} {'updated':>9}"
+    )
+    for player_count in args.players:
+        for busy in (False, True):
+            for dirty in (False, True):
+                for batched in (False, True):
+                    mean_frame_time, mean_pixels = run(
+                        player_count, busy, dirty, batched
+                    )
+                    print(
+                        f"{'busy' if busy else 'idle':<6} {player_count:>7} "
+                        f"{'dirty' if dirty else 'full':<6} "
+                        f"{'batched' if batched else 'single':<7} "
+                        f"{mean_frame_time * 1000:>7.2f} ms "
+                        f"{mean_pixels / (SCREEN_WIDTH * SCREEN_HEIGHT):>8.0%}"
+                    )
+
+    construct_time, draw_time = run_arrows()
+    print(
+        f"arrows construct {construct_time * 1e6:.0f} µs, "
+        f"draw {draw_time * 1e6:.0f} µs"
+    )
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a captured dance floor")
+    parser.add_argument("capture", type=str, help="Capture file (NET_CAPTURE_FILE)")
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Replay as fast as possible, rendering one frame per datagram",
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="Use the dummy SDL video driver"
+    )
+    parser.add_argument("--user-id", type=str, default="", help="Main player id")
+    return parser.parse_args()
+
+
+args = parse_args()
+if args.headless:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT
+from graphics.screens import ScreenManager, DanceFloorScreen
+from network.capture import read_capture
+from network.udp import handle_datagram
+
+# Gaps longer than this are treated as a break between captured sessions.
+MAX_REPLAY_GAP = 5
+
+pygame.init()
+
+screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+pygame.display.set_caption("Twirl replay")
+
+
+def _datagrams_with_delays(path):
+    previous = None
+    for timestamp, data in read_capture(path):
+        delay = 0 if previous is None else timestamp - previous
+        if not 0 <= delay <= MAX_REPLAY_GAP:
+            delay = 0
+        previous = timestamp
+        yield delay, data
+
+
+def main():
+    screen_manager = ScreenManager()
+    screen_manager.set_credentials({"userId": args.user_id, "token": ""})
+    dance_floor = DanceFloorScreen(screen_manager, connect=False)
+    screen_manager.set_screen(dance_floor)
+
+    clock = pygame.time.Clock()
+    datagrams = _datagrams_with_delays(args.capture)
+    next_datagram = next(datagrams, None)
+    replay_time = 0
+    replayed = 0
+    frames = 0
+    frame_time = 0
+    started_at = time.perf_counter()
+
+    while next_datagram is not None:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                next_datagram = None
+            screen_manager.handle_event(event)
+
+        if args.fast:
+            handle_datagram(next_datagram[1], dance_floor.publish_state)
+            replayed += 1
+            next_datagram = next(datagrams, None)
+        else:
+            replay_time += clock.tick(30) / 1000
+            while next_datagram is not None and next_datagram[0] <= replay_time:
+                replay_time -= next_datagram[0]
+                handle_datagram(next_datagram[1], dance_floor.publish_state)
+                replayed += 1
+                next_datagram = next(datagrams, None)
+
+        frame_started_at = time.perf_counter()
+        screen_manager.update()
+        dirty_rects = screen_manager.draw(screen)
+        if dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+        frame_time += time.perf_counter() - frame_started_at
+        frames += 1
+
+    elapsed = time.perf_counter() - started_at
+    print(f"Replayed {replayed} datagrams in {elapsed:.2f} s")
+    if frames:
+        print(f"{frames} frames, {frame_time / frames * 1000:.2f} ms mean frame time")
+
+    pygame.quit()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import time
+
+from network.signing import MessageSigner, jsonify
+
+USER_ID = "bench-user"
+TOKEN = "0123456789abcdef0123456789abcdef"
+LOCATION_ID = "signing-bench"
+FORMATS = ["binary", "json"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare signing outgoing events with and without MessageSigner"
+    )
+    parser.add_argument(
+        "--messages", type=int, default=100_000, help="Messages per event type"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Best of this many runs")
+    return parser.parse_args()
+
+
+def calculate_hmac(contents, token):
+    hmac_result = hmac.new(
+        token.encode("utf-8"), contents.encode("utf-8"), hashlib.sha256
+    )
+    return hmac_result.hexdigest()
+
+
+def sign(user_id, token, event, contents):
+    """Builds a message the way every event was sent before MessageSigner."""
+    message = {
+        "userId": str(user_id),
+        "event": event,
+        "contents": contents,
+        "hmac": calculate_hmac(jsonify(contents), token),
+    }
+    return json.dumps(message).encode()
+
+
+def old_move(x, y):
+    return sign(USER_ID, TOKEN, "move", {"latitude": y, "longitude": x})
+
+
+def old_status(status):
+    return sign(USER_ID, TOKEN, "status", status)
+
+
+def old_mark(mark):
+    return sign(USER_ID, TOKEN, "mark", mark)
+
+
+def old_hello():
+    return sign(USER_ID, TOKEN, "hello", LOCATION_ID)
+
+
+def check(signer, positions):
+    # Both ways must produce the same message, up to whitespace.
+    for x, y in positions[:100]:
+        assert json.loads(signer.move(x, y)) == json.loads(old_move(x, y))
+    assert json.loads(signer.status("dancing")) == json.loads(old_status("dancing"))
+    assert json.loads(signer.mark("perfect")) == json.loads(old_mark("perfect"))
+    hello = json.loads(signer.hello(LOCATION_ID, FORMATS))
+    del hello["formats"]
+    assert hello == json.loads(old_hello())
+
+
+def measure(build, count, runs):
+    best = None
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        for i in range(count):
+            build(i)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best
+
+
+def main():
+    args = parse_args()
+    random.seed(0)
+    positions = [
+        (random.uniform(0, 1200), random.uniform(0, 700)) for _ in range(1024)
+    ]
+    signer = MessageSigner(USER_ID, TOKEN)
+    check(signer, positions)
+
+    statuses = ["dancing", "idle"]
+    marks = ["perfect", "good", "miss"]
+    events = {
+        "move": (
+            lambda i: old_move(*positions[i % 1024]),
+            lambda i: signer.move(*positions[i % 1024]),
+            lambda i: signer.move(*positions[i % 1024], binary=True),
+        ),
+        "status": (
+            lambda i: old_status(statuses[i % 2]),
+            lambda i: signer.status(statuses[i % 2]),
+            lambda i: signer.status(statuses[i % 2], binary=True),
+        ),
+        "mark": (
+            lambda i: old_mark(marks[i % 3]),
+            lambda i: signer.mark(marks[i % 3]),
+            lambda i: signer.mark(marks[i % 3], binary=True),
+        ),
+        "hello": (
+            lambda i: old_hello(),
+            lambda i: signer.hello(LOCATION_ID, FORMATS, b', "seq": %d' % i),
+            None,
+        ),
+    }
+
+    print(f"{'event':<7} {'old':>12} {'signer':>12} {'binary':>12} {'speedup':>8}")
+    for event, (old, new, binary) in events.items():
+        old_rate = measure(old, args.messages, args.runs)
+        new_rate = measure(new, args.messages, args.runs)
+        binary_rate = measure(binary, args.messages, args.runs) if binary else None
+        print(
+            f"{event:<7} {old_rate:>10,.0f}/s {new_rate:>10,.0f}/s "
+            + (f"{binary_rate:>10,.0f}/s " if binary_rate else f"{'-':>12} ")
+            + f"{new_rate / old_rate:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
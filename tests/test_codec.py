@@ -0,0 +1,228 @@
+import pytest
+
+from models import GameState, PlayerState, SongState
+from network import codec
+from network.signing import MessageSigner
+
+
+def make_player(index, **fields):
+    values = {
+        "userId": f"user-{index}",
+        "username": f"dancer{index}",
+        "latitude": 10.5 * index,
+        "longitude": 20.25 * index,
+        "isMain": index == 0,
+        "status": "dancing" if index % 2 else "idle",
+        "lastMark": codec.MARKS[index % len(codec.MARKS)],
+        "color": codec.COLORS[1 + index % (len(codec.COLORS) - 1)],
+    }
+    values.update(fields)
+    return PlayerState(**values)
+
+
+def make_state(sequence=None, player_count=3, **fields):
+    values = {
+        "players": [make_player(i) for i in range(player_count)],
+        "locationTitle": "Floor ♪",
+        "sequence": sequence,
+    }
+    values.update(fields)
+    return GameState(**values)
+
+
+def round_trip(game_state, encoder=None, decoder=None):
+    data = codec.encode_game_state(game_state, encoder or codec.PlayerTable())
+    return codec.decode_game_state(data, decoder or codec.PlayerTable())
+
+
+def test_round_trip_minimal_state():
+    game_state = make_state()
+    assert round_trip(game_state) == game_state
+
+
+def test_round_trip_full_state():
+    game_state = make_state(
+        sequence=7,
+        serverTime=1_700_000_000_123,
+        echo=42,
+        song=SongState(
+            id="song-1",
+            title="Song",
+            bpm=128,
+            onset=0.5,
+            startTimestamp=1_700_000_000_000,
+        ),
+        arrowCombination=["0", "-1", "2", "-3"],
+        scores={"dancer1": 10, "dancer2": -3},
+    )
+    assert round_trip(game_state) == game_state
+
+
+def test_round_trip_empty_collections():
+    game_state = make_state(player_count=0, arrowCombination=[], scores={})
+    assert round_trip(game_state) == game_state
+
+
+def test_identities_are_announced_until_acknowledged():
+    encoder = codec.PlayerTable()
+    first = codec.encode_game_state(make_state(sequence=1), encoder)
+    second = codec.encode_game_state(make_state(sequence=2), encoder)
+    assert len(second) == len(first)
+
+    encoder.acknowledge(2)
+    third = codec.encode_game_state(make_state(sequence=3), encoder)
+    assert len(third) < len(second)
+
+    decoder = codec.PlayerTable()
+    codec.decode_game_state(second, decoder)
+    assert codec.decode_game_state(third, decoder) == make_state(sequence=3)
+    assert decoder.latest_sequence == 3
+
+
+def test_reordered_states_decode_while_unacknowledged():
+    encoder = codec.PlayerTable()
+    encoded = [
+        codec.encode_game_state(make_state(sequence=sequence), encoder)
+        for sequence in (1, 2, 3)
+    ]
+    decoder = codec.PlayerTable()
+    for index in (1, 0, 2):
+        game_state = codec.decode_game_state(encoded[index], decoder)
+        assert game_state == make_state(sequence=index + 1)
+
+
+def test_acknowledging_a_state_without_a_player_keeps_announcing_it():
+    encoder = codec.PlayerTable()
+    codec.encode_game_state(make_state(sequence=1, player_count=3), encoder)
+    codec.encode_game_state(make_state(sequence=2, player_count=1), encoder)
+    encoder.acknowledge(2)
+    assert encoder.acknowledged == {0}
+
+    # The client never saw players 1 and 2 announced, so they still are.
+    data = codec.encode_game_state(make_state(sequence=3, player_count=3), encoder)
+    decoder = codec.PlayerTable()
+    decoder.set_identity(0, "user-0", "dancer0")
+    assert codec.decode_game_state(data, decoder) == make_state(sequence=3)
+
+
+def test_forgotten_acknowledgements_are_announced_again():
+    encoder = codec.PlayerTable()
+    codec.encode_game_state(make_state(sequence=1), encoder)
+    encoder.acknowledge(1)
+    encoder.forget_acknowledgements()
+    data = codec.encode_game_state(make_state(sequence=2), encoder)
+    assert codec.decode_game_state(data, codec.PlayerTable()) == make_state(sequence=2)
+
+
+def test_unsequenced_states_announce_once():
+    encoder = codec.PlayerTable()
+    first = codec.encode_game_state(make_state(), encoder)
+    second = codec.encode_game_state(make_state(), encoder)
+    assert len(second) < len(first)
+
+
+def test_unknown_player_index_is_rejected():
+    encoder = codec.PlayerTable()
+    codec.encode_game_state(make_state(sequence=1), encoder)
+    encoder.acknowledge(1)
+    data = codec.encode_game_state(make_state(sequence=2), encoder)
+    with pytest.raises(codec.CodecError, match="Unknown player index"):
+        codec.decode_game_state(data, codec.PlayerTable())
+
+
+def test_truncated_states_are_rejected():
+    data = codec.encode_game_state(
+        make_state(sequence=1, arrowCombination=["1"], scores={"a": 1}),
+        codec.PlayerTable(),
+    )
+    for size in range(len(data)):
+        with pytest.raises(codec.CodecError):
+            codec.decode_game_state(data[:size], codec.PlayerTable())
+
+
+def test_unknown_codes_are_rejected():
+    data = bytearray(codec.encode_game_state(make_state(), codec.PlayerTable()))
+    offset = data.index(b"user-0") - 1 - codec.PLAYER.size
+    # The color code is the last byte of the first player record.
+    data[offset + codec.PLAYER.size - 1] = len(codec.COLORS)
+    with pytest.raises(codec.CodecError, match="Unknown color"):
+        codec.decode_game_state(bytes(data), codec.PlayerTable())
+
+    with pytest.raises(codec.CodecError, match="Unknown status"):
+        codec.encode_game_state(
+            make_state(players=[make_player(0, status="sleeping")]),
+            codec.PlayerTable(),
+        )
+
+
+def test_not_a_game_state():
+    assert not codec.is_binary(b'{"players": []}')
+    with pytest.raises(codec.CodecError):
+        codec.decode_game_state(b'{"players": []}', codec.PlayerTable())
+
+
+def test_peek_sequence():
+    table = codec.PlayerTable()
+    data = codec.encode_game_state(make_state(sequence=123_456), table)
+    assert codec.peek_sequence(data) == 123_456
+    assert codec.peek_sequence(codec.encode_game_state(make_state(), table)) is None
+    assert codec.peek_sequence(data[:5]) is None
+
+
+@pytest.mark.parametrize(
+    "event, contents, expected",
+    [
+        ("move", codec.encode_move(1.5, -2.25), {"latitude": 1.5, "longitude": -2.25}),
+        ("status", codec.encode_status("dancing"), "dancing"),
+        ("mark", codec.encode_mark("perfect"), "perfect"),
+    ],
+)
+def test_event_round_trip(event, contents, expected):
+    data = codec.encode_event("user-1", event, contents, b"\x00" * codec.HMAC_SIZE)
+    user_id, decoded_event, decoded_contents, digest, link = codec.decode_event(data)
+    assert (user_id, decoded_event, digest, link) == ("user-1", event, b"\x00" * 32, {})
+    assert codec.decode_event_contents(event, decoded_contents) == expected
+
+
+def test_signed_binary_events_verify():
+    signer = MessageSigner("user-1", "token")
+    data = signer.move(3.0, 4.0, binary=True, extra=codec.encode_link(7, 5))
+    user_id, event, contents, digest, link = codec.decode_event(data)
+    assert (user_id, event, link) == ("user-1", "move", {"seq": 7, "ack": 5})
+    assert signer.digest(contents).digest() == digest
+    assert codec.decode_event_contents(event, contents) == {
+        "latitude": 4.0,
+        "longitude": 3.0,
+    }
+
+
+def test_truncated_events_are_rejected():
+    data = codec.encode_event("user-1", "mark", codec.encode_mark("good"), b"")
+    with pytest.raises(codec.TruncatedError):
+        codec.decode_event(data)
+    with pytest.raises(codec.CodecError):
+        codec.decode_event_contents("move", b"\x00")
+
+
+@pytest.mark.parametrize(
+    "seq, ack, resync, expected",
+    [
+        (3, None, False, {"seq": 3}),
+        (3, 9, True, {"seq": 3, "ack": 9, "resync": True}),
+        (None, None, False, {}),
+    ],
+)
+def test_link_fields_follow_the_digest(seq, ack, resync, expected):
+    signer = MessageSigner("user-1", "token")
+    data = signer.mark("good", binary=True, extra=codec.encode_link(seq, ack, resync))
+    _, _, contents, digest, link = codec.decode_event(data)
+    assert signer.digest(contents).digest() == digest
+    assert link == expected
+
+
+def test_truncated_link_fields_are_rejected():
+    data = MessageSigner("user-1", "token").status("idle", binary=True)
+    with pytest.raises(codec.TruncatedError):
+        codec.decode_event(data + codec.encode_link(1)[:-1])
+    with pytest.raises(codec.CodecError):
+        codec.decode_event(data + codec.encode_link(1) + b"\x00")
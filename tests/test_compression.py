@@ -0,0 +1,45 @@
+import zlib
+
+import pytest
+
+from network import compression
+
+# Update together with a new BUILTIN_DICTIONARY id when the file changes.
+BUILTIN_DICTIONARY_CRC = 0xC27ED282
+
+
+def test_builtin_dictionary_is_frozen():
+    dictionary = compression.DICTIONARIES[compression.BUILTIN_DICTIONARY]
+    assert zlib.crc32(dictionary) == BUILTIN_DICTIONARY_CRC
+    assert str(compression.BUILTIN_DICTIONARY) in compression.BUILTIN_DICTIONARY_FILE
+
+
+def test_round_trip():
+    compressor = compression.Compressor()
+    payload = b'{"players": [], "locationTitle": "Floor"}' * 10
+    data = compressor.compress(payload)
+    assert compression.is_compressed(data)
+    assert len(data) < len(payload)
+    assert compressor.decompress(data) == (payload, compression.BUILTIN_DICTIONARY)
+
+
+def test_custom_dictionary():
+    dictionary = compression.build_dictionary([b"abcdef" * 20, b"ghijkl" * 20])
+    compressor = compression.Compressor()
+    compressor.add_dictionary(compression.CUSTOM_DICTIONARY, dictionary)
+    data = compressor.compress(b"ghijkl" * 5, compression.CUSTOM_DICTIONARY)
+    assert compressor.decompress(data) == (
+        b"ghijkl" * 5,
+        compression.CUSTOM_DICTIONARY,
+    )
+    with pytest.raises(compression.CompressionError, match="Unknown dictionary"):
+        compression.Compressor().decompress(data)
+
+
+def test_malformed_datagrams():
+    compressor = compression.Compressor()
+    data = compressor.compress(b"payload" * 10)
+    with pytest.raises(compression.CompressionError):
+        compressor.decompress(data[:-2])
+    with pytest.raises(compression.CompressionError):
+        compressor.decompress(b"not compressed")
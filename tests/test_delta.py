@@ -0,0 +1,96 @@
+import json
+
+from local_server import Client, LocalServer
+from models import GameStateDelta
+from network.delta import SnapshotTable
+from tests.test_codec import make_player, make_state
+
+
+def make_delta(snapshot_id, base_id=None, players=(), removed=()):
+    return GameStateDelta(
+        snapshotId=snapshot_id,
+        baseId=base_id,
+        players=list(players),
+        removed=list(removed),
+        locationTitle="Floor",
+    )
+
+
+def user_ids(game_state):
+    return sorted(player.user_id for player in game_state.players)
+
+
+def test_deltas_apply_on_their_base():
+    table = SnapshotTable()
+    table.apply(make_delta(1, players=[make_player(0), make_player(1)]))
+    table.apply(make_delta(2, 1, players=[make_player(2)], removed=["user-0"]))
+    game_state = table.apply(make_delta(3, 1, players=[make_player(3)]))
+    assert user_ids(game_state) == ["user-0", "user-1", "user-3"]
+    assert game_state.sequence == 3
+
+
+def test_old_and_duplicate_deltas_are_stale():
+    table = SnapshotTable()
+    table.apply(make_delta(1))
+    table.apply(make_delta(2, 1))
+    table.apply(make_delta(3, 1))
+    assert table.apply(make_delta(2, 1)) is None
+    assert table.apply(make_delta(3, 1)) is None
+    # A keyframe with the latest id is a duplicate as well.
+    assert table.apply(make_delta(3)) is None
+    assert table.stale == 3
+
+
+def test_missing_base_requests_a_resync():
+    table = SnapshotTable()
+    table.apply(make_delta(1))
+    assert table.apply(make_delta(3, 2)) is None
+    assert table.resync_requested
+    table.apply(make_delta(4))
+    assert not table.resync_requested
+
+
+def test_older_keyframe_starts_over():
+    table = SnapshotTable()
+    table.apply(make_delta(1, players=[make_player(0)]))
+    table.apply(make_delta(500, 1))
+
+    game_state = table.apply(make_delta(1, players=[make_player(1)]))
+    assert user_ids(game_state) == ["user-1"]
+    assert table.latest_id == 1
+    assert table.resets == 1
+    assert table.apply(make_delta(2, 1)) is not None
+
+
+def encode_delta(client, player_count):
+    client.snapshot_id += 1
+    game_state = make_state(player_count=player_count)
+    return json.loads(LocalServer._encode_delta(client, game_state))
+
+
+def test_server_bases_deltas_on_the_acknowledged_snapshot():
+    client = Client("user-0", None)
+    assert "baseId" not in encode_delta(client, 2)
+    # Nothing acknowledged yet: keyframes only.
+    assert "baseId" not in encode_delta(client, 3)
+
+    client.acked_snapshot = 1
+    delta = encode_delta(client, 1)
+    assert delta["baseId"] == 1
+    assert delta["removed"] == ["user-1"]
+    delta = encode_delta(client, 3)
+    assert delta["baseId"] == 1
+    assert [player["userId"] for player in delta["players"]] == ["user-2"]
+
+    client.acked_snapshot = 4
+    delta = encode_delta(client, 3)
+    assert (delta["baseId"], delta["players"], delta["removed"]) == (4, [], [])
+
+
+def test_server_sends_a_keyframe_for_a_forgotten_snapshot():
+    client = Client("user-0", None)
+    encode_delta(client, 1)
+    client.acked_snapshot = 1
+    for _ in range(40):
+        delta = encode_delta(client, 1)
+    assert "baseId" not in delta
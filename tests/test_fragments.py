@@ -0,0 +1,156 @@
+import pytest
+
+from network import fragments
+from network.fragments import Reassembler, split
+
+PAYLOAD = bytes(range(256)) * 4
+DATAGRAM_SIZE = fragments.HEADER.size + 100
+
+
+def test_split_sizes_and_headers():
+    parts = split(PAYLOAD, 7, DATAGRAM_SIZE)
+    assert len(parts) == 11
+    assert all(len(part) <= DATAGRAM_SIZE for part in parts)
+    for index, part in enumerate(parts):
+        assert fragments.is_fragment(part)
+        assert fragments.HEADER.unpack_from(part) == (fragments.MAGIC, 7, index, 11)
+    assert b"".join(part[fragments.HEADER.size :] for part in parts) == PAYLOAD
+
+
+def test_split_small_and_empty_payloads():
+    assert len(split(b"abc", 1, DATAGRAM_SIZE)) == 1
+    assert split(b"", 1, DATAGRAM_SIZE) == [fragments.HEADER.pack(0xF7, 1, 0, 1)]
+
+
+def test_split_wraps_snapshot_id():
+    part = split(b"abc", 1 << 32 | 5, DATAGRAM_SIZE)[0]
+    assert fragments.HEADER.unpack_from(part)[1] == 5
+
+
+def test_split_rejects_too_many_fragments():
+    with pytest.raises(fragments.FragmentError):
+        split(bytes(0x10000 + 1), 1, fragments.HEADER.size + 1)
+
+
+def test_in_order_reassembly():
+    reassembler = Reassembler()
+    parts = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    results = [reassembler.add(part, now=0.0) for part in parts]
+    assert results[:-1] == [None] * (len(parts) - 1)
+    assert results[-1] == PAYLOAD
+    assert reassembler.get_stats()["pending"] == 0
+    assert reassembler.pending_bytes == 0
+
+
+def test_single_fragment_snapshot():
+    reassembler = Reassembler()
+    assert reassembler.add(split(b"abc", 1, DATAGRAM_SIZE)[0], now=0.0) == b"abc"
+    assert reassembler.completed == 1
+
+
+def test_out_of_order_reassembly():
+    reassembler = Reassembler()
+    parts = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    order = [5, 0, 10, 3, 1, 9, 2, 8, 4, 7, 6]
+    results = [reassembler.add(parts[index], now=0.0) for index in order]
+    assert results[-1] == PAYLOAD
+    assert results[:-1] == [None] * (len(parts) - 1)
+
+
+def test_interleaved_snapshots():
+    reassembler = Reassembler()
+    first = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    second = split(PAYLOAD[::-1], 2, DATAGRAM_SIZE)
+    completed = []
+    for a, b in zip(first, second):
+        for part in (b, a):
+            payload = reassembler.add(part, now=0.0)
+            if payload is not None:
+                completed.append(payload)
+    assert completed == [PAYLOAD[::-1], PAYLOAD]
+
+
+def test_duplicate_fragments_are_ignored():
+    reassembler = Reassembler()
+    parts = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    reassembler.add(parts[0], now=0.0)
+    assert reassembler.add(parts[0], now=0.0) is None
+    assert reassembler.duplicates == 1
+    assert reassembler.pending_bytes == len(parts[0]) - fragments.HEADER.size
+    results = [reassembler.add(part, now=0.0) for part in parts[1:]]
+    assert results[-1] == PAYLOAD
+
+
+def test_already_completed_snapshot_is_ignored():
+    reassembler = Reassembler()
+    parts = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    for part in parts:
+        reassembler.add(part, now=0.0)
+    for part in parts:
+        assert reassembler.add(part, now=0.0) is None
+    assert reassembler.duplicates == len(parts)
+    assert reassembler.completed == 1
+    assert not reassembler.pending
+
+
+def test_incomplete_snapshot_expires():
+    reassembler = Reassembler(timeout=1.0)
+    parts = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    reassembler.add(parts[0], now=0.0)
+    reassembler.add(parts[1], now=0.5)
+    assert reassembler.expired == 0
+
+    # The snapshot is dropped on the next fragment after the timeout, so
+    # the rest of it starts a new, incomplete snapshot.
+    results = [reassembler.add(part, now=1.0) for part in parts[2:]]
+    assert results == [None] * (len(parts) - 2)
+    assert reassembler.expired == 1
+    assert reassembler.completed == 0
+
+
+def test_expiry_keeps_newer_snapshots():
+    reassembler = Reassembler(timeout=1.0)
+    old = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    new = split(PAYLOAD, 2, DATAGRAM_SIZE)
+    reassembler.add(old[0], now=0.0)
+    reassembler.add(new[0], now=0.8)
+    reassembler.add(new[1], now=1.2)
+    assert list(reassembler.pending) == [2]
+    assert reassembler.expired == 1
+
+
+def test_eviction_by_count():
+    reassembler = Reassembler(max_pending=2)
+    snapshots = [split(PAYLOAD, snapshot, DATAGRAM_SIZE) for snapshot in (1, 2, 3)]
+    for parts in snapshots:
+        reassembler.add(parts[0], now=0.0)
+    assert list(reassembler.pending) == [2, 3]
+    assert reassembler.evicted == 1
+    assert reassembler.pending_bytes == 2 * 100
+
+    # The evicted snapshot can no longer complete.
+    results = [reassembler.add(part, now=0.0) for part in snapshots[0][1:]]
+    assert results[-1] is None
+
+
+def test_eviction_by_bytes():
+    reassembler = Reassembler(max_bytes=250)
+    first = split(PAYLOAD, 1, DATAGRAM_SIZE)
+    second = split(PAYLOAD, 2, DATAGRAM_SIZE)
+    reassembler.add(first[0], now=0.0)
+    reassembler.add(first[1], now=0.0)
+    assert reassembler.evicted == 0
+    reassembler.add(second[0], now=0.0)
+    assert list(reassembler.pending) == [2]
+    assert reassembler.pending_bytes == 100
+    assert reassembler.evicted == 1
+
+
+def test_malformed_fragments():
+    reassembler = Reassembler()
+    assert reassembler.add(fragments.HEADER.pack(0xF7, 1, 0, 0), now=0.0) is None
+    assert reassembler.add(fragments.HEADER.pack(0xF7, 1, 2, 2), now=0.0) is None
+    parts = split(PAYLOAD, 3, DATAGRAM_SIZE)
+    reassembler.add(parts[0], now=0.0)
+    assert reassembler.add(fragments.HEADER.pack(0xF7, 3, 1, 2), now=0.0) is None
+    assert reassembler.malformed == 3
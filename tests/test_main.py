@@ -0,0 +1,9 @@
+import importlib
+
+import pygame
+
+
+def test_importing_main_opens_no_window():
+    # The offload worker imports the main module again when it is spawned.
+    importlib.import_module("main")
+    assert pygame.display.get_surface() is None
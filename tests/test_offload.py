@@ -0,0 +1,51 @@
+import pytest
+
+from network.offload import PlayerRecords, StateRing, SLOT_HEADER
+from tests.test_codec import make_player, make_state
+
+
+@pytest.fixture
+def ring():
+    reader = StateRing()
+    writer = StateRing(reader.name)
+    yield reader, writer
+    writer.close()
+    reader.close()
+
+
+def test_states_read_back_with_records(ring):
+    reader, writer = ring
+    game_state = make_state(sequence=3, scores={"dancer1": 2})
+    writer.publish(game_state)
+    read = reader.read_latest()
+    assert isinstance(read.players, PlayerRecords)
+    assert list(read.players) == game_state.players
+    assert read.model_copy(update={"players": game_state.players}) == game_state
+    assert reader.read_latest() is None
+
+
+def test_identities_are_kept_while_unchanged(ring):
+    reader, writer = ring
+    writer.publish(make_state(sequence=1))
+    first = reader.read_latest().players
+    moved = make_state(sequence=2)
+    moved.players[0] = make_player(0, latitude=99.0)
+    writer.publish(moved)
+    second = reader.read_latest().players
+    assert second.generation == first.generation
+    assert second.identities is first.identities
+    assert second.records["position"][0].tolist() == [0.0, 99.0]
+
+    writer.publish(make_state(sequence=3, player_count=4))
+    assert reader.read_latest().players.generation != first.generation
+
+
+def test_superseded_and_torn_states_are_counted(ring):
+    reader, writer = ring
+    for sequence in (1, 2, 3):
+        writer.publish(make_state(sequence=sequence))
+    assert reader.read_latest().sequence == 3
+    writer.publish(make_state(sequence=4))
+    SLOT_HEADER.pack_into(reader.memory.buf, reader._slot_offset(4), 0, 0)
+    assert reader.read_latest() is None
+    assert reader.get_stats() == {"applied": 1, "superseded": 2, "torn": 1}
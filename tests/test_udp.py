@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+from network import codec, udp
+from tests.test_codec import make_state
+
+
+def feed(data):
+    delivered = []
+    udp.handle_datagram(data, delivered.append)
+    return delivered
+
+
+def test_reordered_binary_states_are_delivered():
+    udp.reset_session()
+    encoder = codec.PlayerTable()
+    encoded = [
+        codec.encode_game_state(make_state(sequence=sequence), encoder)
+        for sequence in (1, 2, 3)
+    ]
+    assert feed(encoded[1]) == [make_state(sequence=2)]
+    assert feed(encoded[0]) == []
+    assert feed(encoded[2]) == [make_state(sequence=3)]
+    assert udp.wire_format == codec.BINARY_FORMAT
+    assert udp._acknowledged_sequence() == 3
+
+
+def encode_states(*sequences):
+    encoder = codec.PlayerTable()
+    return [
+        codec.encode_game_state(make_state(sequence=sequence), encoder)
+        for sequence in sequences
+    ]
+
+
+def test_corrupt_state_does_not_hold_back_later_states():
+    udp.reset_session()
+    first, second = encode_states(4, 5)
+    assert feed(second[:-1]) == []
+    assert feed(first) == [make_state(sequence=4)]
+    assert udp.latest_sequence == 4
+
+
+def test_large_backward_jump_resets_the_sequence():
+    udp.reset_session()
+    (latest,) = encode_states(100)
+    feed(latest)
+    (restarted,) = encode_states(100 - udp.SEQUENCE_REORDER_WINDOW - 1)
+    assert len(feed(restarted)) == 1
+    assert udp.latest_sequence == 100 - udp.SEQUENCE_REORDER_WINDOW - 1
+
+
+def test_player_named_sequence_does_not_make_states_stale():
+    udp.reset_session()
+    states = [
+        make_state(sequence=sequence, scores={"sequence": 1}) for sequence in (2, 3)
+    ]
+    for game_state in states:
+        assert feed(game_state.model_dump_json(by_alias=True).encode()) == [game_state]
+    assert udp.latest_sequence == 3
+
+
+def test_sequence_not_sent_first_is_checked_once_decoded():
+    udp.reset_session()
+    newer, older = (
+        json.dumps(
+            {
+                "players": [],
+                "locationTitle": "Floor",
+                "scores": {"sequence": 99},
+                "sequence": sequence,
+            }
+        ).encode()
+        for sequence in (5, 4)
+    )
+    assert len(feed(newer)) == 1
+    assert udp.latest_sequence == 5
+    stale = udp.stats.counters["stale"]
+    assert feed(older) == []
+    assert udp.stats.counters["stale"] == stale + 1
+
+
+def test_older_keyframe_resets_the_sequence():
+    udp.reset_session()
+    udp.latest_sequence = 10
+    keyframe = b'{"snapshotId": 1, "players": [], "removed": []}'
+    delta = b'{"snapshotId": 9, "baseId": 8, "players": [], "removed": []}'
+    assert udp._is_stale(*udp._peek_state(keyframe)) is False
+    assert udp._is_stale(*udp._peek_state(delta))
+    assert udp._is_stale(*udp._peek_state(keyframe.replace(b"1", b"10")))
+
+
+def test_player_named_snapshot_id_does_not_make_a_delta():
+    udp.reset_session()
+    game_state = make_state(sequence=1, scores={"snapshotId": 1, "baseId": 1})
+    data = game_state.model_dump_json(by_alias=True).encode()
+    assert feed(data) == [game_state]
+    # Without the sequence first, the state is told apart once decoded.
+    data = json.dumps(
+        {"scores": {"snapshotId": 2}, "players": [], "locationTitle": "Floor"}
+    ).encode()
+    assert len(feed(data)) == 1
+
+
+def test_delta_with_its_base_id_further_on_is_checked_once_decoded():
+    udp.reset_session()
+    udp.latest_sequence = 10
+    delta = b'{"snapshotId": 9, "locationTitle": "Floor", "baseId": 8}'
+    assert udp._peek_state(delta) == (9, None)
+    stale = udp.stats.counters["stale"]
+    assert feed(delta) == []
+    assert udp.stats.counters["stale"] == stale + 1
+    assert udp.latest_sequence == 10
+
+
+def test_hellos_are_skipped_while_moving(monkeypatch):
+    udp.reset_session()
+    sent = []
+    monkeypatch.setattr(udp, "HELLO_INTERVAL", 0.05)
+    monkeypatch.setattr(udp, "_send", sent.append)
+    monkeypatch.setattr(udp, "outbound", udp.OutboundQueue(rate_limit=1000))
+
+    async def move():
+        for step in range(30):
+            udp.issue_move("user-1", "token", float(step), 2.0)
+            udp.outbound.flush(udp._send_signed)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        hello = asyncio.create_task(udp.handle_hello("user-1", "token"))
+        await move()
+        hello.cancel()
+
+    asyncio.run(run())
+    messages = [json.loads(data) for data in sent]
+    events = [message["event"] for message in messages]
+    assert events == ["move"] * 30
+    # The moves carry the probes instead.
+    assert [message["seq"] for message in messages] == list(range(30))
+    udp.link.on_echo(29)
+    assert udp.link.samples == 1
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+LOCATION_ID = "transport-bench"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compare the threaded and the asyncio UDP clients while rendering"
+    )
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=[10, 100],
+        help="Players in every game state",
+    )
+    parser.add_argument("--rate", type=int, default=30, help="Game states/s")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration per run")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate cap")
+    # Runs the game state sender in its own process, so it does not compete
+    # with the client for the GIL.
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+
+def now_us():
+    # CLOCK_MONOTONIC is shared by every process on the machine.
+    return time.monotonic_ns() // 1000
+
+
+def make_state(player_count):
+    return {
+        "players": [
+            {
+                "userId": f"bench-{i}",
+                "username": f"dancer{i}",
+                "latitude": random.uniform(0, 600),
+                "longitude": random.uniform(0, 1100),
+                "isMain": i == 0,
+                "status": "dancing" if i % 2 else "idle",
+                "color": "white",
+            }
+            for i in range(player_count)
+        ],
+        "locationTitle": "Benchmark floor",
+        "scores": {f"dancer{i}": i for i in range(min(player_count, 5))},
+    }
+
+
+def serve(port):
+    """Sends game states stamped with their send time to the first client."""
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server_socket.bind(("127.0.0.1", port))
+    server_socket.settimeout(10)
+    _, address = server_socket.recvfrom(65536)
+    state = make_state(args.players[0])
+    interval = 1 / args.rate
+    started_at = time.monotonic()
+    for sequence in range(1, int(args.seconds * args.rate) + 1):
+        # Clients peek at the sequence, which has to come first.
+        payload = {"sequence": sequence, **state, "serverTime": now_us()}
+        server_socket.sendto(json.dumps(payload).encode(), address)
+        time.sleep(max(0, started_at + sequence * interval - time.monotonic()))
+    # Keep the port open until the client is closed.
+    time.sleep(1)
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+if args.serve:
+    serve(args.serve)
+    sys.exit()
+
+import pygame
+
+from graphics.common import SCREEN_WIDTH, SCREEN_HEIGHT
+from graphics.screens import ScreenManager, DanceFloorScreen
+from network import udp
+from network.signing import MessageSigner
+
+pygame.init()
+
+screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+
+class ThreadedClient:
+    """The client before the asyncio transport: one thread sleeping between
+    hellos and one blocking in recvfrom.
+
+    Datagrams go through the same udp.handle_datagram as the asyncio client,
+    so only the transport differs.
+    """
+
+    def __init__(self, address, update_state):
+        self.address = address
+        self.hello = MessageSigner("bench-0", "").hello(LOCATION_ID, ["json"])
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._send_hellos, daemon=True),
+            threading.Thread(target=self._receive, daemon=True, args=(update_state,)),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _send_hellos(self):
+        while self.running:
+            self.socket.sendto(self.hello, self.address)
+            time.sleep(udp.HELLO_INTERVAL)
+
+    def _receive(self, update_state):
+        while self.running:
+            try:
+                data, _ = self.socket.recvfrom(65536)
+            except OSError:
+                return
+            udp.handle_datagram(data, update_state)
+
+    def close(self):
+        self.running = False
+        self.socket.close()
+
+
+class AsyncioClient:
+    def __init__(self, address, update_state):
+        udp.SERVER_ADDRESS = address
+        udp.initialize_client("bench-0", "", update_state, LOCATION_ID, offload=False)
+
+    def close(self):
+        udp.close_client()
+
+
+def run(client_class, player_count):
+    port = free_port()
+    sender = subprocess.Popen(
+        [
+            sys.executable,
+            __file__,
+            "--serve",
+            str(port),
+            "--players",
+            str(player_count),
+            "--rate",
+            str(args.rate),
+            "--seconds",
+            str(args.seconds),
+        ]
+    )
+    time.sleep(0.5)
+
+    screen_manager = ScreenManager()
+    screen_manager.set_credentials({"userId": "bench-0", "token": ""})
+    dance_floor = DanceFloorScreen(screen_manager, connect=False)
+    screen_manager.set_screen(dance_floor)
+    latencies = []
+
+    def update_state(game_state):
+        latencies.append(now_us() - game_state.server_time)
+        dance_floor.publish_state(game_state)
+
+    udp.reset_session()
+    client = client_class(("127.0.0.1", port), update_state)
+    clock = pygame.time.Clock()
+    frame_times = []
+    expected = int(args.seconds * args.rate)
+    while len(latencies) < expected and sender.poll() is None:
+        started_at = time.perf_counter()
+        pygame.event.pump()
+        screen_manager.update()
+        screen_manager.draw(screen)
+        pygame.display.flip()
+        frame_times.append(time.perf_counter() - started_at)
+        clock.tick(args.fps)
+    client.close()
+    sender.wait()
+
+    received = len(latencies)
+    latencies.sort()
+    return (
+        statistics.mean(frame_times),
+        statistics.quantiles(frame_times, n=100)[98],
+        received / expected,
+        statistics.median(latencies) if latencies else 0,
+        latencies[int(received * 0.99)] if latencies else 0,
+    )
+
+
+def main():
+    print(
+        f"{'players':>7} {'client':<8} {'frame':>10} {'p99':>10} "
+        f"{'received':>9} {'latency':>10} {'p99':>10}"
+    )
+    clients = (("threaded", ThreadedClient), ("asyncio", AsyncioClient))
+    for player_count in args.players:
+        for name, client_class in clients:
+            frame, frame_p99, received, latency, latency_p99 = run(
+                client_class, player_count
+            )
+            print(
+                f"{player_count:>7} {name:<8} {frame * 1000:>7.2f} ms "
+                f"{frame_p99 * 1000:>7.2f} ms {received:>9.0%} "
+                f"{latency / 1000:>7.2f} ms {latency_p99 / 1000:>7.2f} ms"
+            )
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()